@@ -0,0 +1,143 @@
+import io
+import os
+import sys
+import gzip
+import time
+import zlib
+import shutil
+import tarfile
+import zipfile
+import tempfile
+
+# --- Configuration ---
+SAMPLE_BYTES = 256 * 1024   # How much of a member is test-compressed
+MIN_SAVING = 0.10           # Deflate a member only if the sample shrinks by 10% or more
+FIXED_EPOCH = 315532800     # 1980-01-01 UTC, the earliest zip date: member time in deterministic archives
+
+
+def worth_compressing(data):
+    """
+    Test-compresses a slice from the middle of the data. PDFs whose streams
+    are already Flate/DCT compressed barely shrink, so they are stored as-is
+    instead of spending CPU on a second compression.
+    """
+    if len(data) < 1024:
+        return False
+    start = max(0, len(data) // 2 - SAMPLE_BYTES // 2)
+    sample = data[start:start + SAMPLE_BYTES]
+    return len(zlib.compress(sample, 1)) < len(sample) * (1 - MIN_SAVING)
+
+
+class ArchiveWriter:
+    """
+    Writes branded PDFs straight into one zip or tar archive, one member per
+    input, as each file completes. The format follows the file extension
+    (.zip, .tar, .tar.gz/.tgz). Pass "-" to write an uncompressed tar stream
+    to stdout.
+
+    For zip archives compress=True deflates members that are worth it and
+    stores the rest; tar.gz always compresses the whole stream.
+
+    deterministic=True makes the same members give the same archive bytes:
+    every member gets the SOURCE_DATE_EPOCH (or FIXED_EPOCH) time, and the
+    members are held in a temporary folder (not in memory) and written in
+    name order on close, whatever order they completed in.
+    """
+
+    def __init__(self, path, compress=True, deterministic=False):
+        self.path = path
+        self.compress = compress
+        self.deterministic = deterministic
+        self.names = set()
+        self.members = 0
+        self.bytes_in = 0
+        self.held = []  # (name, temporary file) of the members written on close
+        self.held_dir = tempfile.mkdtemp(prefix=".archive-") if deterministic else None
+        self.gzip_file = None
+        if path == "-":
+            self.kind = "tar"
+            # sys.__stdout__: the real stdout, even while messages are redirected to stderr
+            self.archive = tarfile.open(fileobj=sys.__stdout__.buffer, mode="w|")
+        elif path.lower().endswith(".zip"):
+            self.kind = "zip"
+            self.archive = zipfile.ZipFile(path, "w", allowZip64=True)
+        elif path.lower().endswith((".tar.gz", ".tgz")):
+            self.kind = "tar"
+            if deterministic:
+                # tarfile would stamp the current time into the gzip header
+                self.gzip_file = gzip.GzipFile(path, "wb", mtime=self.member_time())
+                self.archive = tarfile.open(fileobj=self.gzip_file, mode="w")
+            else:
+                self.archive = tarfile.open(path, "w:gz")
+        elif path.lower().endswith(".tar"):
+            self.kind = "tar"
+            self.archive = tarfile.open(path, "w")
+        else:
+            raise ValueError(f"Unsupported archive type: {path} (use .zip, .tar or .tar.gz)")
+
+    def unique_name(self, name):
+        """
+        Avoids two members with the same name (same file name in different folders).
+        """
+        base, ext = os.path.splitext(name)
+        candidate = name
+        counter = 2
+        while candidate in self.names:
+            candidate = f"{base}_{counter}{ext}"
+            counter += 1
+        self.names.add(candidate)
+        return candidate
+
+    def member_time(self):
+        if not self.deterministic:
+            return int(time.time())
+        return max(FIXED_EPOCH, int(os.environ.get("SOURCE_DATE_EPOCH", FIXED_EPOCH)))
+
+    def write_member(self, name, data):
+        if self.kind == "zip":
+            if self.deterministic:
+                date_time = time.gmtime(self.member_time())[:6]
+            else:
+                date_time = time.localtime()[:6]
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED if self.compress and worth_compressing(data) else zipfile.ZIP_STORED
+            self.archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = self.member_time()
+            self.archive.addfile(info, io.BytesIO(data))
+
+    def add(self, name, data):
+        """
+        Adds one member and returns the name it was stored under.
+        """
+        name = self.unique_name(name)
+        if self.deterministic:
+            held_path = os.path.join(self.held_dir, str(len(self.held)))
+            with open(held_path, "wb") as f:
+                f.write(data)
+            self.held.append((name, held_path))
+        else:
+            self.write_member(name, data)
+        self.members += 1
+        self.bytes_in += len(data)
+        return name
+
+    def close(self):
+        try:
+            for name, held_path in sorted(self.held):
+                with open(held_path, "rb") as f:
+                    self.write_member(name, f.read())
+            self.archive.close()
+            if self.gzip_file is not None:
+                self.gzip_file.close()
+        finally:
+            if self.held_dir:
+                shutil.rmtree(self.held_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
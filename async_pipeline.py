@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+
+import branding
+import scheduler
+import batch_branding
+import shared_assets
+import metrics as pipeline_metrics
+
+# --- Configuration ---
+OUTPUT_DIR = "branded_output"
+PREFETCH = 4                 # Files read ahead of the branding workers (and results waiting to be written)
+CHECKSUM_FILE = "SHA256SUMS"
+
+
+def init_worker(manifest):
+    branding.install_assets(shared_assets.attach_assets(manifest))
+
+
+def brand_job(input_path, data, options):
+    """
+    Runs in a worker process: brands PDF bytes that were already read by the
+    reader stage and returns (output bytes, stats). stats["worker_pid"] tells
+    the parent whose memory to report.
+    """
+    options = dict(options)
+    deterministic = options.pop("deterministic", False)
+    if options.get("qr"):
+        options.setdefault("doc_id", branding.document_id(input_path))
+    stats = {"worker_pid": os.getpid()}
+    doc = fitz.open(stream=data, filetype="pdf")
+    branding.brand_document(doc, stats=stats, **options)
+    if deterministic:
+        branding.make_reproducible(doc, input_path, options, input_data=data)  # No second read of the file
+    output = doc.tobytes(no_new_id=deterministic)
+    doc.close()
+    return output, stats
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_file(path, data):
+    """
+    Writes the output next to its final name first, so a crash never leaves
+    a half-written PDF behind, and returns its SHA-256.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    partial = path + ".part"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, path)
+    return digest
+
+
+async def run_pipeline(jobs, workers=2, options=None, prefetch=PREFETCH, image_max_px=None, metrics=None):
+    """
+    Brands jobs with three overlapping stages joined by bounded queues:
+    a reader that prefetches input bytes, branding on a process pool, and a
+    writer that saves each result and computes its checksum. Disk reads and
+    writes run in threads, so storage and CPUs are busy at the same time;
+    the queues keep at most about 2 * prefetch + workers files in memory.
+    Files are read (and so branded) in scheduler.JobQueue order, shortest
+    first within their priority class, like batch_branding.run_batch.
+    A metrics.Metrics instance as metrics is kept up to date as files move
+    through the stages.
+    If a worker process dies (e.g. killed for memory), the pool is replaced
+    and every job it was running is retried once in a process of its own,
+    so only the job that crashes again fails and the rest of the batch
+    continues.
+    Returns (finished, failed) lists of job dicts; finished jobs get "sha256".
+    """
+    loop = asyncio.get_running_loop()
+    options = options or {}
+    read_queue = asyncio.Queue(maxsize=prefetch)
+    write_queue = asyncio.Queue(maxsize=prefetch)
+    finished, failed = [], []
+    busy = 0
+    unread = len(jobs)
+
+    def fail(job, error):
+        job["message"] = repr(error)
+        failed.append(job)
+        if metrics:
+            metrics.record_file(job, "failed")
+
+    def update_gauges():
+        if metrics:
+            metrics.set("queue_depth", unread + read_queue.qsize())
+            metrics.set("workers_busy", busy)
+            metrics.write_textfile(force=False)
+
+    worker_numbers = {}  # pid -> "worker" label of the current pool's processes
+
+    def record_rss(pid):
+        rss = batch_branding.worker_rss_mb(pid)
+        if metrics and rss is not None:
+            number = worker_numbers.setdefault(pid, len(worker_numbers))
+            metrics.set("worker_rss_bytes", rss * 1024 * 1024, worker=number)
+
+    def forget_workers():
+        if metrics:
+            for number in worker_numbers.values():
+                metrics.remove("worker_rss_bytes", worker=number)
+        worker_numbers.clear()
+
+    queue = scheduler.JobQueue()
+    for job in jobs:
+        queue.push(job)
+
+    async def reader():
+        nonlocal unread
+        while queue:
+            job = queue.pop()
+            unread -= 1
+            update_gauges()
+            try:
+                data = await asyncio.to_thread(read_file, job["input"])
+            except OSError as error:
+                fail(job, error)
+                continue
+            await read_queue.put((job, data))
+        for _ in range(workers):
+            await read_queue.put(None)
+
+    pools = []  # The current process pool is pools[-1]
+
+    def new_pool(size):
+        return ProcessPoolExecutor(size, initializer=init_worker, initargs=(assets.manifest,))
+
+    async def brand(job, data):
+        pool = pools[-1]
+        try:
+            return await loop.run_in_executor(pool, brand_job, job["input"], data, options)
+        except BrokenProcessPool:
+            if pool is pools[-1]:  # The first brander to notice replaces the pool
+                pool.shutdown(wait=False)
+                pools.append(new_pool(workers))
+                forget_workers()
+        # A broken pool fails all its running jobs: retry alone to find the one that crashed it
+        print(f"Worker crashed, retrying on its own: {job['input']}")
+        with new_pool(1) as alone:
+            return await loop.run_in_executor(alone, brand_job, job["input"], data, options)
+
+    async def brander():
+        nonlocal busy
+        while (item := await read_queue.get()) is not None:
+            job, data = item
+            start = time.monotonic()
+            busy += 1
+            update_gauges()
+            try:
+                output, job["stats"] = await brand(job, data)
+                record_rss(job["stats"].pop("worker_pid"))
+            except Exception as error:
+                fail(job, error)
+                continue
+            finally:
+                busy -= 1
+                update_gauges()
+            job["seconds"] = round(time.monotonic() - start, 3)
+            await write_queue.put((job, output))
+
+    async def writer():
+        while (item := await write_queue.get()) is not None:
+            job, output = item
+            try:
+                job["sha256"] = await asyncio.to_thread(write_file, job["output"], output)
+            except OSError as error:
+                fail(job, error)
+                continue
+            print(f"Saved: {job['output']}")
+            finished.append(job)
+            if metrics:
+                metrics.record_file(job, "done", len(output))
+
+    # Prepare the assets once and share them with every worker
+    with shared_assets.SharedAssets(branding.prepare_assets(image_max_px=image_max_px)) as assets:
+        pools.append(new_pool(workers))
+        try:
+            branders = [asyncio.create_task(brander()) for _ in range(workers)]
+            writer_task = asyncio.create_task(writer())
+            await reader()
+            await asyncio.gather(*branders)
+            await write_queue.put(None)
+            await writer_task
+        finally:
+            pools[-1].shutdown()
+    update_gauges()
+    return finished, failed
+
+
+def write_checksums(path, finished):
+    """
+    Writes a checksum list in the format `sha256sum -c` understands.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for job in sorted(finished, key=lambda job: job["output"]):
+            f.write(f"{job['sha256']}  {os.path.basename(job['output'])}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brand a batch of PDFs with reading, branding and writing overlapped.")
+    parser.add_argument("inputs", nargs="+", help="PDF files or folders")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help=f"output folder (default: {OUTPUT_DIR})")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="number of branding processes")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH, help=f"files read ahead (default: {PREFETCH})")
+    parser.add_argument("--first-page-logos", action="store_true", help="put the header logos on the first page only")
+    parser.add_argument("--watermark-placement", choices=["center", "adaptive"], default="center",
+                        help="adaptive moves the watermark to the emptiest area of each page")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-identical output for identical inputs (fixed document ID and dates)")
+    parser.add_argument("--metrics-file", default=None,
+                        help="write Prometheus metrics to this file (node_exporter textfile collector, *.prom)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while the batch runs")
+    parser.add_argument("--image-max-px", type=int, default=None,
+                        help="downscale the watermark and logos to this many pixels (e.g. 600 for screen use)")
+    parser.add_argument("--priority-rule", action="append", default=[], metavar="PATTERN=CLASS",
+                        help='priority class by file name, e.g. "*worksheet*=high" (classes: high, normal, low; repeatable)')
+    parser.add_argument("--default-priority", choices=list(scheduler.PRIORITY_CLASSES), default=scheduler.DEFAULT_PRIORITY,
+                        help="priority class of files no rule matches")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs, rejected = batch_branding.build_jobs(args.inputs, args.output_dir)
+    for job in rejected:
+        print(f"Rejected: {job['input']} ({job['message']})")
+    try:
+        rules = [scheduler.parse_rule(rule) for rule in args.priority_rule]
+    except ValueError as error:
+        parser.error(str(error))
+    scheduler.assign_priorities(jobs, rules, args.default_priority)
+
+    metrics = None
+    if args.metrics_file or args.metrics_port is not None:
+        metrics = pipeline_metrics.Metrics(textfile=args.metrics_file)
+        if args.metrics_port is not None:
+            print(f"Metrics: http://127.0.0.1:{metrics.serve(args.metrics_port)}/metrics")
+        for job in rejected:
+            metrics.record_file(job, "rejected")
+
+    start = time.monotonic()
+    finished, failed = asyncio.run(run_pipeline(
+        jobs,
+        workers=max(1, args.workers),
+        options={
+            "logos_all_pages": not args.first_page_logos,
+            "watermark_placement": args.watermark_placement,
+            "deterministic": args.deterministic,
+        },
+        prefetch=max(1, args.prefetch),
+        image_max_px=args.image_max_px,
+        metrics=metrics,
+    ))
+    elapsed = time.monotonic() - start
+    if metrics:
+        metrics.close()
+
+    checksum_path = os.path.join(args.output_dir, CHECKSUM_FILE)
+    write_checksums(checksum_path, finished)
+    for job in failed:
+        print(f"Failed: {job['input']} ({job['message']})")
+    print("=" * 30)
+    print(f"Branded {len(finished)} file(s) in {elapsed:.1f}s; {len(failed)} failed, "
+          f"{len(rejected)} rejected. Checksums in {checksum_path}.")
+    sys.exit(1 if failed else 0)
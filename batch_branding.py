@@ -0,0 +1,466 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from multiprocessing.connection import wait
+
+import branding
+import preflight
+import archive_output
+import estimate
+import text_index
+import shared_assets
+import profiles
+import metrics as batch_metrics
+import scheduler
+
+try:
+    import psutil  # Optional: used to read worker memory on every platform
+except ImportError:
+    psutil = None
+
+# --- Configuration ---
+OUTPUT_DIR = "branded_output"
+QUARANTINE_FILE = "quarantine.json"
+JOB_TIMEOUT = 120           # Seconds a single PDF may take before its worker is killed
+MEMORY_LIMIT_MB = 2048      # Resident memory a worker may reach before it is killed
+POLL_INTERVAL = 0.2         # How often the watchdog checks running jobs
+
+
+def worker_rss_mb(pid):
+    """
+    Returns the resident memory of a process in MB, or None if it cannot be read.
+    """
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def worker_main(conn, options, manifest):
+    """
+    Runs inside a worker process: brands one job at a time until told to stop.
+    The branding assets are attached from the parent's shared memory, so the
+    worker starts warm and the cache stays warm for its whole life.
+    With brand profiles (options["profiles"], from profiles.share_profiles),
+    the parent's compiled profiles are attached from shared memory as well
+    and each job names the profile to use.
+    With options["quiet_stdout"], progress goes to stderr (stdout carries a tar stream).
+    """
+    branding.install_assets(shared_assets.attach_assets(manifest))
+    options = dict(options)
+    if options.pop("quiet_stdout", False):
+        sys.stdout = sys.stderr
+    shared_profiles = options.pop("profiles", None)
+    profile_set = profiles.attach_profiles(shared_profiles) if shared_profiles else None
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        input_path, output_path, to_bytes, profile_name = job
+        job_options = dict(options, profile=profile_set[profile_name]) if profile_name else options
+        stats = {}
+        try:
+            if to_bytes:
+                # The parent writes the result into the archive
+                data = branding.brand_to_bytes(input_path, stats=stats, **job_options)
+                conn.send(("done", "", stats, data))
+            else:
+                result = branding.apply_branding(input_path, output_path, stats=stats, **job_options)
+                conn.send(("done" if result else "error", "" if result else "file not found", stats, None))
+        except Exception as error:
+            conn.send(("error", repr(error), stats, None))
+    conn.close()
+
+
+class Worker:
+    """
+    One branding process plus the job it is currently running.
+    """
+
+    def __init__(self, options, manifest):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_conn, options, manifest), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.started = 0.0
+
+    def submit(self, job, to_bytes=False):
+        self.job = job
+        self.started = time.monotonic()
+        self.conn.send((job["input"], job["output"], to_bytes, job.get("profile")))
+
+    def finish(self):
+        job, self.job = self.job, None
+        job["finished_at"] = time.monotonic()
+        job["seconds"] = round(job["finished_at"] - self.started, 3)
+        return job
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
+
+def remove_output(job):
+    """
+    Deletes whatever a killed worker may have left of a job's output: the
+    temporary .partial file and anything under the final name.
+    """
+    for path in (f"{job['output']}.partial", job["output"]):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def check_watchdog(worker, timeout, memory_limit_mb):
+    """
+    Returns the reason a running job must be killed, or None if it may continue.
+    """
+    elapsed = time.monotonic() - worker.started
+    if elapsed > timeout:
+        return f"timeout after {elapsed:.1f}s"
+    rss = worker_rss_mb(worker.process.pid)
+    if rss is not None and rss > memory_limit_mb:
+        return f"memory {rss:.0f} MB over the {memory_limit_mb} MB limit"
+    return None
+
+
+def run_batch(jobs, workers=2, options=None, timeout=JOB_TIMEOUT, memory_limit_mb=MEMORY_LIMIT_MB,
+              image_max_px=None, archive=None, text_index=None, metrics=None, profile_set=None):
+    """
+    Brands every job on a pool of watched worker processes.
+    Jobs run shortest-first within their priority class (job["priority"],
+    see scheduler.JobQueue). All jobs are queued at the start, so no new
+    small job can keep a big one waiting: it runs once the smaller ones are done.
+    options are passed to branding.apply_branding as keyword arguments.
+    image_max_px downscales the watermark and logos once, before the workers start.
+    With an archive_output.ArchiveWriter as archive, results are written into
+    the archive as they complete instead of into separate files.
+    With a compiled profiles.ProfileSet as profile_set, every job is branded
+    with the profile named in job["profile"] (see assign_profiles); the
+    profiles' images are shared with the workers like the default assets.
+    With a text_index.TextIndex as text_index, the workers read the page text
+    while branding and the parent adds it to the index, keyed by output.
+    A metrics.Metrics instance as metrics is kept up to date as jobs finish.
+    A job that times out, runs out of memory or crashes its worker is
+    quarantined and only that worker is replaced.
+    Returns (finished, failed, quarantined) lists of job dicts.
+    """
+    # Prepare the assets once in the parent and share them with every worker
+    assets = shared_assets.SharedAssets(branding.prepare_assets(image_max_px=image_max_px))
+    manifest = assets.manifest
+
+    options = dict(options or {})
+    if archive is not None and archive.path == "-":
+        options["quiet_stdout"] = True
+    profile_segments = []
+    if profile_set is not None:
+        profile_segments, options["profiles"] = profiles.share_profiles(profile_set)
+    if text_index is not None:
+        options["extract_text"] = True
+    pending = scheduler.JobQueue()
+    for job in jobs:
+        pending.push(job)
+    pool = [Worker(options, manifest) for _ in range(max(1, min(workers, len(pending))))]
+    finished, failed, quarantined = [], [], []
+
+    try:
+        while pending or any(worker.job for worker in pool):
+            for worker in pool:
+                if worker.job is None and pending:
+                    worker.submit(pending.pop(), to_bytes=archive is not None)
+            if metrics:
+                metrics.set("queue_depth", len(pending))
+                metrics.set("workers_busy", sum(1 for worker in pool if worker.job))
+
+            busy = {worker.conn: worker for worker in pool if worker.job}
+            for conn in wait(list(busy), timeout=POLL_INTERVAL):
+                worker = busy[conn]
+                try:
+                    status, message, stats, data = conn.recv()
+                except (EOFError, OSError):
+                    status, message, stats, data = "crashed", f"worker exited with code {worker.process.exitcode}", {}, None
+
+                job = worker.finish()
+                job["message"] = message
+                job["stats"] = stats
+                if metrics:
+                    bytes_out = 0
+                    if status == "done":
+                        bytes_out = len(data) if data is not None else os.path.getsize(job["output"])
+                    metrics.record_file(job, {"done": "done", "error": "failed"}.get(status, "quarantined"), bytes_out)
+                if status == "done":
+                    if data is not None:
+                        job["output"] = archive.add(os.path.basename(job["output"]), data)
+                    if text_index is not None:
+                        text_index.add_document(job["output"], stats.pop("page_text", []))
+                    finished.append(job)
+                elif status == "error":
+                    failed.append(job)
+                else:
+                    quarantined.append(job)
+                    worker.kill()
+                    if archive is None:
+                        remove_output(job)
+                    pool[pool.index(worker)] = Worker(options, manifest)
+
+            for index, worker in enumerate(pool):
+                if metrics:
+                    rss = worker_rss_mb(worker.process.pid)
+                    if rss is not None:
+                        metrics.set("worker_rss_bytes", rss * 1024 * 1024, worker=index)
+                if worker.job is None:
+                    continue
+                reason = check_watchdog(worker, timeout, memory_limit_mb)
+                if reason:
+                    print(f"Quarantined: {worker.job['input']} ({reason})")
+                    worker.kill()
+                    job = worker.finish()
+                    if archive is None:
+                        remove_output(job)
+                    job["message"] = reason
+                    quarantined.append(job)
+                    if metrics:
+                        metrics.record_file(job, "quarantined")
+                    pool[index] = Worker(options, manifest)
+            if metrics:
+                metrics.write_textfile(force=False)
+        if metrics:
+            metrics.set("queue_depth", 0)
+            metrics.set("workers_busy", 0)
+    finally:
+        for worker in pool:
+            worker.stop()
+        assets.close()
+        for segments in profile_segments:
+            segments.close()
+
+    return finished, failed, quarantined
+
+
+def output_paths(input_paths, output_dir):
+    """
+    Maps every input to output_dir/DBG_<name>. Inputs with the same file name
+    (class1/worksheet.pdf, class2/worksheet.pdf) get DBG_worksheet.pdf,
+    DBG_worksheet_2.pdf, ... in input path order, so no output overwrites another.
+    """
+    outputs, taken = {}, set()
+    for path in sorted(set(input_paths)):
+        base, ext = os.path.splitext(f"DBG_{os.path.basename(path)}")
+        name, counter = base + ext, 2
+        while name.lower() in taken:  # Also distinct on case-insensitive file systems
+            name = f"{base}_{counter}{ext}"
+            counter += 1
+        taken.add(name.lower())
+        outputs[path] = os.path.abspath(os.path.join(output_dir, name))
+    return outputs
+
+
+def build_jobs(inputs, output_dir, workers=1):
+    """
+    Pre-flights the inputs (on workers processes) and returns (jobs, rejected).
+    Jobs carry the pre-flight page count and cost estimate for the scheduler.
+    """
+    reports = preflight.scan_all(preflight.expand_inputs(inputs), workers=workers)
+    outputs = output_paths([os.path.abspath(report["path"]) for report in reports], output_dir)
+    jobs = [
+        {
+            "input": os.path.abspath(report["path"]),
+            "output": outputs[os.path.abspath(report["path"])],
+            "pages": report["pages"],
+            "bytes": report["file_bytes"],
+            "cost": report["cost"],
+        }
+        for report in preflight.sort_queue(reports)
+    ]
+    rejected = [
+        {"input": os.path.abspath(report["path"]), "message": f"{report['status']}: {report['reason']}"}
+        for report in reports
+        if report["status"] != "ok"
+    ]
+    return jobs, rejected
+
+
+def assign_profiles(jobs, profile_set):
+    """
+    Picks the brand profile for every job from the profile rules.
+    """
+    for job in jobs:
+        job["profile"] = profile_set.select(job["input"]).name
+
+
+def write_quarantine(path, quarantined):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(quarantined, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brand a batch of PDFs on watched worker processes.")
+    parser.add_argument("inputs", nargs="+", help="PDF files or folders")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help=f"output folder (default: {OUTPUT_DIR})")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--first-page-logos", action="store_true", help="put the header logos on the first page only")
+    parser.add_argument("--watermark-placement", choices=["center", "adaptive"], default="center",
+                        help="adaptive moves the watermark to the emptiest area of each page")
+    parser.add_argument("--avoid-collisions", action="store_true",
+                        help="shift or shrink the logos and footer away from existing page content")
+    parser.add_argument("--qr", choices=["document", "page"], default=None,
+                        help="add a QR code linking to the online version (needs segno)")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-identical output for identical inputs (fixed document ID and dates)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append the branding to a copy of each input instead of rewriting it (big files)")
+    parser.add_argument("--optimise-images", type=int, nargs="?", const=150, default=None, metavar="DPI",
+                        help="downsample embedded images shown above DPI (default 150) to shrink the output")
+    parser.add_argument("--profiles", default=None,
+                        help="brand profile file (TOML/JSON) whose rules pick the logos and footer per file")
+    parser.add_argument("--image-max-px", type=int, default=None,
+                        help="downscale the watermark and logos to this many pixels (e.g. 600 for screen use)")
+    parser.add_argument("--archive", default=None,
+                        help="write all results into one .zip/.tar/.tar.gz archive instead of the output folder")
+    parser.add_argument("--text-index", default=None,
+                        help="also build a full-text search index (SQLite FTS5) of the inputs in this file")
+    parser.add_argument("--no-compress", action="store_true", help="store zip members without compression")
+    parser.add_argument("--metrics-file", default=None,
+                        help="write Prometheus metrics to this file (node_exporter textfile collector, *.prom)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while the batch runs")
+    parser.add_argument("--priority-rule", action="append", default=[], metavar="PATTERN=CLASS",
+                        help='priority class by file name, e.g. "*worksheet*=high" (classes: high, normal, low; repeatable)')
+    parser.add_argument("--default-priority", choices=list(scheduler.PRIORITY_CLASSES), default=scheduler.DEFAULT_PRIORITY,
+                        help="priority class of files no rule matches")
+    parser.add_argument("--estimate", action="store_true",
+                        help="only estimate the time and output size from a few sampled pages, write nothing")
+    parser.add_argument("--timeout", type=float, default=JOB_TIMEOUT, help="seconds allowed per file")
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT_MB, help="MB of memory allowed per worker")
+    args = parser.parse_args()
+    if args.archive == "-":
+        # The tar stream goes to stdout (see ArchiveWriter), so every message goes to stderr
+        sys.stdout = sys.stderr
+    if args.archive and args.incremental:
+        parser.error("--incremental writes next to a copy of each input and cannot be used with --archive")
+    if args.optimise_images and args.incremental:
+        parser.error("--incremental keeps the original images in the file, use a full save with --optimise-images")
+
+    if not args.estimate:
+        os.makedirs(args.output_dir, exist_ok=True)
+    jobs, rejected = build_jobs(args.inputs, args.output_dir, workers=args.workers if args.estimate else 1)
+    for job in rejected:
+        print(f"Rejected: {job['input']} ({job['message']})")
+
+    try:
+        rules = [scheduler.parse_rule(rule) for rule in args.priority_rule]
+    except ValueError as error:
+        parser.error(str(error))
+    scheduler.assign_priorities(jobs, rules, args.default_priority)
+
+    profile_set = None
+    if args.profiles:
+        try:
+            profile_set = profiles.load_profiles(args.profiles, args.image_max_px)
+        except (OSError, profiles.ProfileError) as error:
+            parser.error(f"invalid --profiles: {error}")
+        assign_profiles(jobs, profile_set)
+
+    options = {
+        "logos_all_pages": not args.first_page_logos,
+        "watermark_placement": args.watermark_placement,
+        "avoid_collisions": args.avoid_collisions,
+        "qr": args.qr,
+        "deterministic": args.deterministic,
+        "incremental": args.incremental,
+        "optimise_images": args.optimise_images,
+    }
+
+    if args.estimate:
+        if not jobs:
+            sys.exit("Nothing to estimate: no file passed pre-flight.")
+        if args.image_max_px:
+            branding.install_assets(branding.prepare_assets(image_max_px=args.image_max_px))
+        start = time.monotonic()
+        summary = estimate.estimate_batch(jobs, options, profile_set, workers=max(1, args.workers),
+                                          output_dir=args.archive or args.output_dir)
+        estimate.print_estimate(jobs, summary)
+        free = estimate.free_bytes(args.archive or args.output_dir)
+        if free is not None and summary["output_bytes"] > free:
+            print(f"Warning: only {free / 1e6:.1f} MB free where the outputs would be written.")
+        print(f"Estimate took {time.monotonic() - start:.1f}s; nothing was written.")
+        sys.exit(0)
+
+    archive = archive_output.ArchiveWriter(args.archive, compress=not args.no_compress,
+                                           deterministic=args.deterministic) if args.archive else None
+    index = text_index.TextIndex(args.text_index) if args.text_index else None
+    metrics = None
+    if args.metrics_file or args.metrics_port is not None:
+        metrics = batch_metrics.Metrics(textfile=args.metrics_file)
+        if args.metrics_port is not None:
+            print(f"Metrics: http://127.0.0.1:{metrics.serve(args.metrics_port)}/metrics")
+        for job in rejected:
+            metrics.record_file(job, "rejected")
+
+    start = time.monotonic()
+    try:
+        finished, failed, quarantined = run_batch(
+            jobs,
+            workers=args.workers,
+            options=options,
+            timeout=args.timeout,
+            memory_limit_mb=args.memory_limit,
+            image_max_px=args.image_max_px,
+            archive=archive,
+            text_index=index,
+            metrics=metrics,
+            profile_set=profile_set,
+        )
+    finally:
+        if archive:
+            archive.close()
+        if index:
+            index.close()
+        if metrics:
+            metrics.close()
+    elapsed = time.monotonic() - start
+
+    quarantine_path = os.path.join(args.output_dir, QUARANTINE_FILE)
+    write_quarantine(quarantine_path, quarantined + rejected)
+
+    for job in failed:
+        print(f"Failed: {job['input']} ({job['message']})")
+    for job in finished:
+        for page_num, collisions in job["stats"].get("collisions", {}).items():
+            print(f"Collision: {job['input']} page {page_num}: {'; '.join(collisions)}")
+    saved = 0
+    for job in finished:
+        if job["stats"].get("images_optimised"):
+            saved += job["stats"]["image_bytes_saved"]
+            print(f"Optimised: {job['input']} ({job['stats']['images_optimised']} image(s), "
+                  f"{job['stats']['image_bytes_saved'] / 1e6:.1f} MB saved)")
+    for priority, summary in scheduler.class_stats(finished).items():
+        print(f"Priority {priority}: {summary['files']} file(s), turnaround median {summary['median_seconds']}s, "
+              f"p95 {summary['p95_seconds']}s, max {summary['max_seconds']}s, {summary['pages_per_second']} pages/s")
+    print("=" * 30)
+    print(f"Branded {len(finished)} file(s) in {elapsed:.1f}s; {len(failed)} failed, "
+          f"{len(quarantined) + len(rejected)} quarantined (see {quarantine_path}).")
+    if args.optimise_images:
+        print(f"Image optimisation saved {saved / 1e6:.1f} MB in total.")
+    sys.exit(1 if failed or quarantined else 0)
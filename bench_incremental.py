@@ -0,0 +1,60 @@
+import fitz  # PyMuPDF
+import os
+import time
+import tempfile
+import argparse
+
+import branding
+
+# --- Configuration ---
+SAMPLE_PDF = "Class_1_Exam_Paper_Fixed.pdf"
+
+
+def build_book(source, pages, target):
+    """
+    Repeats the pages of source until the document has the given page count,
+    to simulate a large scanned book. Every copy carries its own images.
+    """
+    src = fitz.open(source)
+    book = fitz.open()
+    while book.page_count < pages:
+        book.insert_pdf(src, to_page=min(src.page_count, pages - book.page_count) - 1)
+    book.save(target)
+    return target
+
+
+def time_run(input_path, output_path, incremental, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        branding.apply_branding(input_path, output_path, incremental=incremental)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, os.path.getsize(output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and incremental saves of branded output.")
+    parser.add_argument("input", nargs="?", default=SAMPLE_PDF, help=f"PDF to brand (default: {SAMPLE_PDF})")
+    parser.add_argument("--pages", type=int, default=0, help="first grow the input to this many pages")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per mode; the best time is reported")
+    args = parser.parse_args()
+
+    branding.load_assets()  # Keep asset preparation out of the timings
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.abspath(args.input)
+        if args.pages:
+            input_path = build_book(input_path, args.pages, os.path.join(work_dir, "book.pdf"))
+
+        full = time_run(input_path, os.path.join(work_dir, "full.pdf"), False, args.repeats)
+        incremental = time_run(input_path, os.path.join(work_dir, "incremental.pdf"), True, args.repeats)
+
+        with fitz.open(input_path) as doc:
+            pages = doc.page_count
+        print("=" * 30)
+        print(f"Input: {args.input} ({pages} pages, {os.path.getsize(input_path) / 1e6:.1f} MB)")
+        print(f"{'Mode':<13}{'Seconds':>9}{'Output MB':>11}")
+        print(f"{'full':<13}{full[0]:>9.3f}{full[1] / 1e6:>11.1f}")
+        print(f"{'incremental':<13}{incremental[0]:>9.3f}{incremental[1] / 1e6:>11.1f}")
+        print(f"Speed-up: {full[0] / incremental[0]:.2f}x")
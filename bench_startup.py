@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# --- Configuration ---
+SAMPLE_PDF = "Class_1_Exam_Paper_Fixed.pdf"
+TOP_IMPORTS = 8       # Slowest top-level imports listed per scenario
+MAX_SLOWDOWN = 1.25   # With --baseline, a scenario this much slower than the baseline fails
+
+# Command lines timed as fresh processes, the way cron jobs and webhooks start the tool
+SCENARIOS = {
+    "help": ["branding.py", "--help"],          # Start-up alone: argument parsing, no PDF work
+    "pipe": ["branding.py", "-"],               # Brand SAMPLE_PDF from stdin to stdout
+}
+
+
+def parse_importtime(stderr):
+    """
+    Reads `python -X importtime` output. Returns (total_ms, {module: ms}) for
+    the top-level imports (their cumulative time includes everything they import).
+    """
+    top = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue  # Header line, or a module imported by another one
+        top[name.strip()] = int(cumulative) / 1000
+    return sum(top.values()), top
+
+
+def run_once(command, stdin_path, importtime=False):
+    flags = ["-X", "importtime"] if importtime else []
+    with open(stdin_path or os.devnull, "rb") as stdin:
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *flags, *command], stdin=stdin,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{result.stderr}")
+    return elapsed, result.stderr
+
+
+def bench(command, stdin_path=None, runs=5):
+    """
+    Times command in runs fresh interpreters (after one warm-up run, so the
+    OS file cache and the branding asset cache are filled) and runs it as
+    often again under -X importtime for the import breakdown. Returns medians.
+    """
+    run_once(command, stdin_path)
+    wall = [run_once(command, stdin_path)[0] for _ in range(runs)]
+    imports = [parse_importtime(run_once(command, stdin_path, importtime=True)[1]) for _ in range(runs)]
+    totals = [total for total, _ in imports]
+    median_run = imports[totals.index(sorted(totals)[len(totals) // 2])][1]
+    return {
+        "wall_ms": round(statistics.median(wall), 1),
+        "import_ms": round(statistics.median(totals), 1),
+        "top_imports": dict(sorted(median_run.items(), key=lambda item: -item[1])[:TOP_IMPORTS]),
+    }
+
+
+def compare(results, baseline, max_slowdown=MAX_SLOWDOWN):
+    """
+    Returns the list of regressions against a saved baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        for key in ("wall_ms", "import_ms"):
+            before = baseline.get(name, {}).get(key)
+            if before and result[key] > before * max_slowdown:
+                regressions.append(f"{name} {key}: {before:.1f} -> {result[key]:.1f}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold start-up time of the branding entry point.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per scenario (the median is reported)")
+    parser.add_argument("--sample", default=SAMPLE_PDF, help=f"PDF for the pipe scenario (default: {SAMPLE_PDF})")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--save", default=None, metavar="FILE", help="write the results as JSON (e.g. as a new baseline)")
+    parser.add_argument("--baseline", default=None, metavar="FILE",
+                        help=f"fail if a scenario is more than {MAX_SLOWDOWN}x slower than in this saved result")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenarios:
+        stdin_path = args.sample if name == "pipe" else None
+        results[name] = bench(SCENARIOS[name], stdin_path, max(1, args.runs))
+
+    print(f"{'Scenario':<10}{'Wall ms':>9}{'Imports ms':>12}  Slowest imports")
+    for name, result in results.items():
+        slowest = ", ".join(f"{module} {ms:.0f}" for module, ms in list(result["top_imports"].items())[:4])
+        print(f"{name:<10}{result['wall_ms']:>9.1f}{result['import_ms']:>12.1f}  {slowest}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved: {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print(f"Slower than baseline: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -1,14 +1,18 @@
-import fitz  # PyMuPDF
 import os
 import io
-from PIL import Image  # Requires: pip install Pillow
+import sys
+import mmap
+import time
+import shutil
+import hashlib
+from types import MappingProxyType
+from dataclasses import dataclass, field
 
-try:
-    import tkinter as tk
-    from tkinter import filedialog
-except ImportError:
-    tk = None
-    filedialog = None
+# PyMuPDF (fitz), Pillow and tkinter are imported where they are used, so
+# --help, argument errors and runs with cached assets start quickly.
+# MuPDF prints its messages to stdout by default; send them to stderr so that
+# in pipe mode (branding.py -) stdout carries nothing but the PDF
+os.environ.setdefault("PYMUPDF_MESSAGE", "fd:2")
 
 # --- Configuration ---
 LEFT_LOGO = "DBG-logo.png"
@@ -18,81 +22,387 @@ WATERMARK_LOGO = "DBG-logo.png"
 # Footer Configuration
 FOOTER_TEXT_CENTER = "Shri Classes & DBG Gurukulam (by IITian Golu Sir)"
 FOOTER_URL = "https://dbggurukulam.com"
+# Font for footer text that Helvetica cannot show (e.g. Hindi); Nirmala.ttf is tried if it is missing
+FOOTER_FONT = "NotoSansDevanagari-Regular.ttf"
+FOOTER_FONT_FALLBACK = "Nirmala.ttf"
 
-def create_transparent_watermark(image_path, opacity=0.30):
+# Prepared watermark and downscaled logos are kept here between runs
+ASSET_CACHE_DIR = ".branding_cache"
+ASSET_CACHE_VERSION = 1  # Bump when the prepared images change without their builder's code changing
+
+def create_transparent_watermark(image_path, opacity=0.30, max_px=None):
     """
     Reads an image, reduces its opacity (Alpha channel) to the given percentage,
     and returns the image data in bytes.
     opacity=0.30 means 30% visibility (70% transparent).
+    max_px (optional) downscales the image so its longest side fits.
     """
     if not os.path.exists(image_path):
         return None
-        
+    from PIL import Image  # Requires: pip install Pillow
+
     # Open image and ensure it has an Alpha channel (RGBA)
     img = Image.open(image_path).convert("RGBA")
+    if max_px and max(img.size) > max_px:
+        img.thumbnail((max_px, max_px), Image.LANCZOS)
     
-    # Get the pixel data
-    datas = img.getdata()
-    
-    new_data = []
-    for item in datas:
-        # item is a tuple (R, G, B, A)
-        # We scale the existing Alpha (A) by the opacity factor
-        # This ensures transparent backgrounds stay transparent!
-        new_alpha = int(item[3] * opacity)
-        new_data.append((item[0], item[1], item[2], new_alpha))
-    
-    # Update image data
-    img.putdata(new_data)
+    # We scale the existing Alpha (A) by the opacity factor
+    # This ensures transparent backgrounds stay transparent!
+    # (point() runs in C, so this is fast even for large logos)
+    alpha = img.getchannel("A").point(lambda a: int(a * opacity))
+    img.putalpha(alpha)
     
     # Save to a byte buffer (memory) instead of a file
     img_buffer = io.BytesIO()
     img.save(img_buffer, format="PNG")
     return img_buffer.getvalue()
 
-def apply_branding(input_path, output_filename, logos_all_pages=True):
-    input_path = os.path.abspath(input_path)
-    if not os.path.exists(input_path):
-        print(f"Skipping: {input_path} (File not found)")
-        return
+def map_file(path):
+    """
+    Maps a file read-only into memory. The pages come straight from the OS
+    page cache, so processes mapping the same file share one copy.
+    Returns None for missing or empty files.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    print(f"Processing: {input_path}...")
-    doc = fitz.open(input_path)
-    output_dir = os.path.dirname(input_path)
-    output_path = os.path.join(output_dir, output_filename)
+def open_pdf(input_path):
+    """
+    Opens a PDF from a memory mapping instead of reading it into Python bytes.
+    MuPDF reads directly from the mapped pages (no copy), which keeps peak
+    memory low for very large scanned books.
+    Returns (doc, release) - call release() after closing the document.
+    """
+    import fitz  # PyMuPDF
+    mapping = map_file(input_path)
+    if mapping is None:
+        # Let MuPDF report the problem (e.g. empty file) the usual way
+        return fitz.open(input_path), lambda: None
+
+    view = memoryview(mapping)
+    try:
+        doc = fitz.open(stream=view, filetype="pdf")
+    except Exception:
+        view.release()
+        mapping.close()
+        raise
+
+    def release():
+        view.release()
+        mapping.close()
+
+    return doc, release
+
+def insert_asset(page, rect, data, name, image_xrefs):
+    """
+    Inserts a branding image. The first page embeds it; later pages reuse the
+    same image object by xref, so the image is not copied or hashed again.
+    """
+    if name in image_xrefs:
+        page.insert_image(rect, xref=image_xrefs[name], keep_proportion=True, overlay=True)
+    else:
+        image_xrefs[name] = page.insert_image(rect, stream=bytes(data), keep_proportion=True, overlay=True)
+
+def downscale_logo(image_path, max_px):
+    """
+    Returns the logo as PNG bytes with its longest side at most max_px.
+    """
+    if not os.path.exists(image_path):
+        return None
+    from PIL import Image
+    img = Image.open(image_path)
+    img.thumbnail((max_px, max_px), Image.LANCZOS)
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format="PNG")
+    return img_buffer.getvalue()
+
+def code_digest(code):
+    """
+    Hash of a function's bytecode and constants, stable across runs (nested
+    functions and lambdas are hashed by their own code, not their address).
+    """
+    digest = hashlib.sha256(code.co_code)
+    for const in code.co_consts:
+        digest.update(code_digest(const).encode("ascii") if hasattr(const, "co_code") else repr(const).encode("utf-8"))
+    return digest.hexdigest()
+
+def cached_image(build, image_path, *params):
+    """
+    Returns build(image_path, *params), reusing the result of an earlier run
+    from ASSET_CACHE_DIR while the image file is unchanged. Preparing the
+    watermark takes about half a second (and loads Pillow); scripts that run
+    branding.py once per file skip that after the first run. The key includes
+    ASSET_CACHE_VERSION and a hash of build's code, so editing the builder
+    never serves images made by the old version.
+    """
+    try:
+        info = os.stat(image_path)
+    except OSError:
+        return None
+    key = repr((ASSET_CACHE_VERSION, build.__name__, code_digest(build.__code__),
+                os.path.abspath(image_path), info.st_size, info.st_mtime_ns, params))
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    cache_path = os.path.join(ASSET_CACHE_DIR, f"{name}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}.png")
+    try:
+        with open(cache_path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    data = build(image_path, *params)
+    try:
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        partial = f"{cache_path}.{os.getpid()}.tmp"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, cache_path)
+    except OSError:
+        pass  # Read-only folder: prepare it again next time
+    return data
+
+def prepare_assets(watermark_opacity=0.25, image_max_px=None,
+                   left_logo_path=LEFT_LOGO, right_logo_path=RIGHT_LOGO, watermark_path=WATERMARK_LOGO):
+    """
+    Builds the watermark and logo images (cached between runs, see
+    cached_image). Without image_max_px the logo files are mapped read-only
+    as they are; with it, all images are downscaled (smaller output, quicker
+    embedding).
+    """
+    if image_max_px:
+        left_logo = cached_image(downscale_logo, left_logo_path, image_max_px)
+        right_logo = cached_image(downscale_logo, right_logo_path, image_max_px)
+    else:
+        left_logo = map_file(left_logo_path)
+        right_logo = map_file(right_logo_path)
+    return {
+        "watermark": cached_image(create_transparent_watermark, watermark_path, watermark_opacity, image_max_px),
+        "left_logo": left_logo,
+        "right_logo": right_logo,
+    }
+
+# Branding assets are prepared once per process and reused for every file
+_ASSET_CACHE = {}
+
+def _asset_key(watermark_opacity):
+    return (WATERMARK_LOGO, LEFT_LOGO, RIGHT_LOGO, watermark_opacity)
+
+def install_assets(assets, watermark_opacity=0.25):
+    """
+    Uses assets prepared elsewhere (e.g. by a parent process) for this process.
+    """
+    _ASSET_CACHE[_asset_key(watermark_opacity)] = assets
+
+def load_assets(watermark_opacity=0.25):
+    """
+    Returns the watermark (bytes) and the logo images (bytes-like),
+    preparing them on first use.
+    """
+    key = _asset_key(watermark_opacity)
+    if key not in _ASSET_CACHE:
+        _ASSET_CACHE[key] = prepare_assets(watermark_opacity)
+    return _ASSET_CACHE[key]
+
+@dataclass(frozen=True)
+class BrandProfile:
+    """
+    Everything that decides how a document is branded: logos, watermark,
+    footer text and layout. Profiles are immutable, so one compiled profile
+    (see profiles.py) can be shared by every file of a batch.
+    assets holds the prepared images; None means the process-wide cache
+    built from the module constants above.
+    """
+    name: str
+    left_logo: str
+    right_logo: str
+    watermark_logo: str
+    watermark_opacity: float
+    watermark_size: float
+    logo_size: float
+    margin_top: float
+    margin_side: float
+    footer_text: str
+    footer_url: str
+    footer_offset: float
+    footer_size: float
+    footer_font: str = FOOTER_FONT
+    assets: MappingProxyType = field(default=None, compare=False, repr=False)
+
+    def get_assets(self):
+        if self.assets is None:
+            return load_assets(watermark_opacity=self.watermark_opacity)
+        return self.assets
+
+def default_profile():
+    """
+    The profile built from the constants at the top of this file.
+    """
+    return BrandProfile(
+        name="default",
+        left_logo=LEFT_LOGO,
+        right_logo=RIGHT_LOGO,
+        watermark_logo=WATERMARK_LOGO,
+        watermark_opacity=0.25,  # 0.25 is usually best for text readability
+        watermark_size=300,
+        logo_size=65,
+        margin_top=40,
+        margin_side=60,
+        footer_text=FOOTER_TEXT_CENTER,
+        footer_url=FOOTER_URL,
+        footer_offset=30,
+        footer_size=9,
+    )
+
+def needs_unicode_font(text):
+    """
+    True if the text has characters the built-in Helvetica cannot show.
+    """
+    try:
+        text.encode("latin-1")
+        return False
+    except UnicodeEncodeError:
+        return True
+
+def shaped_text(text, fontsize, font_path, color=None):
+    """
+    Lays out text once on a scratch page with PyMuPDF's HTML engine, which
+    shapes complex scripts such as Devanagari (matras, conjuncts) with
+    HarfBuzz. The font is subset to the glyphs used, so showing the scratch
+    page on every page of a document embeds one small font, once.
+    color is an optional (r, g, b) tuple of 0-1 values (default black).
+    Returns (scratch_doc, clip, baseline): clip is the text area on the
+    scratch page and baseline its distance from the top of clip.
+    """
+    import fitz
+    for path in (font_path, FOOTER_FONT_FALLBACK):
+        if path and os.path.exists(path):
+            font_face = f"@font-face {{font-family: footer; src: url({os.path.basename(path)});}}"
+            archive = fitz.Archive(os.path.dirname(os.path.abspath(path)))
+            break
+    else:
+        font_face, archive = "", None  # Let MuPDF fall back to its own fonts
+    css = f"{font_face} * {{font-family: footer, sans-serif; font-size: {fontsize}px; margin: 0; white-space: nowrap;}}"
+    if color:
+        css += " * {color: rgb(%d, %d, %d);}" % tuple(round(c * 255) for c in color)
 
-    # Prepare the watermark image in memory (30% visible)
-    watermark_data = create_transparent_watermark(WATERMARK_LOGO, opacity=0.25) # 0.25 is usually best for text readability
+    scratch = fitz.open()
+    page = scratch.new_page(width=20 * fontsize * max(1, len(text)), height=4 * fontsize)
+    escaped = text.replace("&", "&amp;").replace("<", "&lt;")
+    page.insert_htmlbox(page.rect, f"<p>{escaped}</p>", css=css, archive=archive)
+    scratch.subset_fonts()
 
+    spans = [
+        span
+        for block in page.get_text("dict")["blocks"]
+        for line in block.get("lines", [])
+        for span in line["spans"]
+    ]
+    clip = fitz.Rect()
+    for span in spans:
+        clip |= span["bbox"]
+    baseline = spans[0]["origin"][1] - clip.y0 if spans else 0
+    return scratch, clip, baseline
+
+def document_id(input_path):
+    """
+    Short, URL-friendly name of a document, e.g. "maths-bodh-manthan-ii-class-1".
+    """
+    stem = os.path.splitext(os.path.basename(input_path))[0].lower()
+    return "-".join("".join(c if c.isalnum() else " " for c in stem).split()) or "document"
+
+def brand_document(doc, logos_all_pages=True, watermark_placement="center", avoid_collisions=False,
+                   qr=None, doc_id="document", extract_text=False, optimise_images=None, profile=None,
+                   stats=None):
+    """
+    Stamps the watermark, header logos and footer on every page of an open document.
+    profile is a BrandProfile (logos, footer text, sizes); the default uses the constants above.
+    watermark_placement="adaptive" moves the watermark to the emptiest area of each page.
+    avoid_collisions=True shifts or shrinks the logos and footer away from existing content.
+    qr="document" adds a QR code linking to the footer URL plus doc_id on every page,
+    qr="page" adds the page number to the link as well (needs segno).
+    extract_text=True records the original text of every page in stats["page_text"]
+    (read in the same pass, before the branding is added) for text_index. It only
+    reads, so the output bytes (and make_reproducible's /ID) are the same without it.
+    optimise_images=150 downsamples embedded images shown above 150 DPI first
+    (see image_optimiser); the bytes saved are recorded in stats.
+    If a dict is passed as stats, per-file details (e.g. collisions per page) are recorded in it.
+    """
+    import fitz
+    if stats is None:
+        stats = {}
+    if profile is None:
+        profile = default_profile()
+
+    if optimise_images:
+        import image_optimiser
+        replaced, saved = image_optimiser.optimise_images(doc, optimise_images)
+        stats["images_optimised"] = replaced
+        stats["image_bytes_saved"] = saved
+        if replaced:
+            print(f"  Optimised {replaced} image(s), saved {saved / 1e6:.1f} MB")
+
+    stamper = None
+    if qr:
+        import qr_stamp  # Needs segno, so only loaded for this mode
+        stamper = qr_stamp.QRStamper(doc)
+
+    # The watermark image is prepared in memory, at the profile's opacity
+    assets = profile.get_assets()
+    watermark_data = assets["watermark"]
+    image_xrefs = {}
+
+    # Footer text Helvetica cannot show is shaped once per font size and
+    # reused as one Form XObject on every page
+    unicode_footer = needs_unicode_font(profile.footer_text)
+    shaped_footers = {}
+
+    stats["collisions"] = {}
+    if extract_text:
+        stats["page_text"] = []
     for page_num, page in enumerate(doc):
         rect = page.rect
+
+        # Read the text while the page is already loaded, before the footer is added
+        if extract_text:
+            stats["page_text"].append(page.get_text())
+
+        # Plan logo and footer positions before we add anything to the page
+        layout = None
+        if avoid_collisions:
+            import placement
+            layout = placement.plan_layout(
+                page, profile.logo_size, profile.margin_top, profile.margin_side,
+                profile.footer_offset, profile.footer_size,
+            )
+            if layout["collisions"]:
+                stats["collisions"][page_num + 1] = layout["collisions"]
+                print(f"  Page {page_num + 1}: " + "; ".join(layout["collisions"]))
         
         # ---------------------------------------------------------
-        # 1. ADD WATERMARK (Centered, 30% visibility)
+        # 1. ADD WATERMARK (Centered or adaptive, 25% visibility)
         # ---------------------------------------------------------
         if watermark_data:
-            wm_width = 300
-            wm_height = 300
-            wm_x = (rect.width - wm_width) / 2
-            wm_y = (rect.height - wm_height) / 2
-            wm_rect = fitz.Rect(wm_x, wm_y, wm_x + wm_width, wm_y + wm_height)
+            wm_width = profile.watermark_size
+            wm_height = profile.watermark_size
+            if watermark_placement == "adaptive":
+                import placement  # Needs numpy, so only loaded for this mode
+                wm_rect = placement.adaptive_watermark_rect(page, wm_width, wm_height)
+            else:
+                wm_x = (rect.width - wm_width) / 2
+                wm_y = (rect.height - wm_height) / 2
+                wm_rect = fitz.Rect(wm_x, wm_y, wm_x + wm_width, wm_y + wm_height)
 
             # We use overlay=True so it sits "above" white backgrounds, 
             # but because we reduced opacity in the image itself, text is visible through it.
-            page.insert_image(
-                wm_rect,
-                stream=watermark_data, # Use the in-memory transparent image
-                keep_proportion=True,
-                overlay=True 
-            )
+            insert_asset(page, wm_rect, watermark_data, "watermark", image_xrefs) # Use the in-memory transparent image
 
         # ---------------------------------------------------------
         # 2. ADD HEADER LOGOS (ALL PAGES)
         # ---------------------------------------------------------
         # Configuration for Header Logos
-        logo_size = 65
-        margin_top = 40
-        margin_side = 60
+        logo_size = profile.logo_size
+        margin_top = profile.margin_top
+        margin_side = profile.margin_side
         
         # Left Logo Rect
         left_rect = fitz.Rect(
@@ -110,58 +420,277 @@ def apply_branding(input_path, output_filename, logos_all_pages=True):
             margin_top + logo_size
         )
 
+        if layout:
+            left_rect = layout["left_rect"]
+            right_rect = layout["right_rect"]
+
         apply_logos = logos_all_pages or page_num == 0
         if apply_logos:
             # Insert Left Logo (DBG)
-            if os.path.exists(LEFT_LOGO):
-                page.insert_image(left_rect, filename=LEFT_LOGO, keep_proportion=True, overlay=True)
+            if assets["left_logo"]:
+                insert_asset(page, left_rect, assets["left_logo"], "left_logo", image_xrefs)
             
             # Insert Right Logo (Mission)
-            if os.path.exists(RIGHT_LOGO):
-                page.insert_image(right_rect, filename=RIGHT_LOGO, keep_proportion=True, overlay=True)
+            if assets["right_logo"]:
+                insert_asset(page, right_rect, assets["right_logo"], "right_logo", image_xrefs)
 
         # ---------------------------------------------------------
         # 3. ADD FOOTER (ALL PAGES)
         # ---------------------------------------------------------
-        footer_y = rect.height - 30
+        footer_y = rect.height - profile.footer_offset
+        footer_size = profile.footer_size
+        if layout:
+            footer_y = layout["footer_y"]
+            footer_size = layout["fontsize"]
+        line_y = footer_y - (footer_size + 6)
         
         # Draw line
         shape = page.new_shape()
-        shape.draw_line((20, footer_y - 15), (rect.width - 20, footer_y - 15))
+        shape.draw_line((20, line_y), (rect.width - 20, line_y))
         shape.finish(color=(0, 0, 0), width=0.5)
         shape.commit()
 
         # Page Number
-        page.insert_text((30, footer_y), f"Page {page_num + 1} of {len(doc)}", fontsize=9, fontname="helv", color=(0, 0, 0))
+        page.insert_text((30, footer_y), f"Page {page_num + 1} of {len(doc)}", fontsize=footer_size, fontname="helv", color=(0, 0, 0))
 
         # Center Text
-        text_len = fitz.get_text_length(FOOTER_TEXT_CENTER, fontname="helv", fontsize=9)
-        center_x = (rect.width - text_len) / 2
-        page.insert_text((center_x, footer_y), FOOTER_TEXT_CENTER, fontsize=9, fontname="helv", color=(0, 0, 0))
+        if unicode_footer:
+            if footer_size not in shaped_footers:
+                shaped_footers[footer_size] = shaped_text(profile.footer_text, footer_size, profile.footer_font)
+            scratch, clip, baseline = shaped_footers[footer_size]
+            center_x = (rect.width - clip.width) / 2
+            text_rect = fitz.Rect(center_x, footer_y - baseline, center_x + clip.width, footer_y - baseline + clip.height)
+            page.show_pdf_page(text_rect, scratch, 0, clip=clip)
+        else:
+            text_len = fitz.get_text_length(profile.footer_text, fontname="helv", fontsize=footer_size)
+            center_x = (rect.width - text_len) / 2
+            page.insert_text((center_x, footer_y), profile.footer_text, fontsize=footer_size, fontname="helv", color=(0, 0, 0))
 
         # URL
-        url_len = fitz.get_text_length(FOOTER_URL, fontname="helv", fontsize=9)
-        page.insert_text((rect.width - url_len - 30, footer_y), FOOTER_URL, fontsize=9, fontname="helv", color=(0, 0, 1))
+        url_len = fitz.get_text_length(profile.footer_url, fontname="helv", fontsize=footer_size)
+        page.insert_text((rect.width - url_len - 30, footer_y), profile.footer_url, fontsize=footer_size, fontname="helv", color=(0, 0, 1))
+
+        # ---------------------------------------------------------
+        # 4. ADD QR CODE (OPTIONAL, above the right end of the footer line)
+        # ---------------------------------------------------------
+        if stamper:
+            qr_size = qr_stamp.QR_SIZE
+            qr_rect = fitz.Rect(rect.width - 20 - qr_size, line_y - 4 - qr_size, rect.width - 20, line_y - 4)
+            payload = qr_stamp.qr_payload(profile.footer_url, doc_id, page_num + 1 if qr == "page" else None)
+            stamper.stamp(page, qr_rect, payload)
+
+def pdf_date(epoch):
+    return time.strftime("D:%Y%m%d%H%M%SZ", time.gmtime(epoch))
+
+def make_reproducible(doc, input_path, options, input_data=None):
+    """
+    Removes everything that makes two saves of the same input differ:
+    the document /ID is derived from the input bytes, the branding assets and
+    the options instead of being random, and the dates are fixed. Dates come
+    from SOURCE_DATE_EPOCH when it is set, otherwise from the input itself.
+    Pass the input bytes as input_data when they are already in memory, so
+    the file is not read again. Save with no_new_id=True so MuPDF keeps the /ID.
+    """
+    digest = hashlib.sha256()
+    if input_data is not None:
+        digest.update(input_data)
+    else:
+        mapping = map_file(input_path)
+        if mapping is not None:
+            digest.update(mapping)
+            mapping.close()
+    profile = options.get("profile") or default_profile()
+    for data in profile.get_assets().values():
+        if data is not None:
+            digest.update(data)
+    # The effective settings, so spelling out a default (or leaving it out) gives the same /ID
+    import inspect
+    settings = {name: parameter.default for name, parameter in inspect.signature(brand_document).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    settings.update((key, value) for key, value in options.items() if key in settings)
+    for key in ("stats", "profile", "extract_text"):  # Hashed above, or no effect on the PDF
+        del settings[key]
+    if not settings["qr"]:
+        del settings["doc_id"]  # Only the QR link uses it
+    digest.update(repr((profile, sorted(settings.items()))).encode("utf-8"))
+    doc_id = digest.hexdigest()[:32].upper()
+    doc.xref_set_key(-1, "ID", f"[<{doc_id}><{doc_id}>]")
+
+    metadata = doc.metadata or {}
+    if os.environ.get("SOURCE_DATE_EPOCH"):
+        fixed_date = pdf_date(int(os.environ["SOURCE_DATE_EPOCH"]))
+    else:
+        fixed_date = metadata.get("modDate") or metadata.get("creationDate") or pdf_date(0)
+    metadata["creationDate"] = metadata.get("creationDate") or fixed_date
+    metadata["modDate"] = fixed_date
+    doc.set_metadata({key: value for key, value in metadata.items() if key not in ("format", "encryption")})
+
+FICLONE = 0x40049409  # Linux ioctl: share the data blocks of another file (Btrfs, XFS)
+
+def clone_file(source, target):
+    """
+    Copies a file, using a copy-on-write reflink when the filesystem supports
+    it (instant, no extra disk space) and a kernel-side copy otherwise.
+    """
+    try:
+        import fcntl
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+    shutil.copyfile(source, target)
+
+def apply_branding_incremental(input_path, output_path, deterministic=False, **options):
+    """
+    Copies the input next to output_path and appends the branding as a PDF
+    incremental update: only the new images, footer text and changed page
+    dictionaries are written, the original bytes are left untouched.
+    Falls back to a full save when the input cannot be updated incrementally
+    (e.g. it needed repairing). The copy only replaces output_path once it
+    is saved, so a failure never leaves an unbranded file under that name.
+    """
+    import fitz
+    partial_path = f"{output_path}.partial"
+    try:
+        clone_file(input_path, partial_path)
+        with fitz.open(partial_path) as doc:
+            incremental = bool(doc.can_save_incrementally())
+            if incremental:
+                brand_document(doc, **options)
+                if deterministic:
+                    make_reproducible(doc, input_path, options)
+                doc.save(partial_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, no_new_id=deterministic)
+        if not incremental:
+            doc, release_input = open_pdf(input_path)
+            try:
+                brand_document(doc, **options)
+                if deterministic:
+                    make_reproducible(doc, input_path, options)
+                doc.save(partial_path, no_new_id=deterministic)
+            finally:
+                doc.close()
+                release_input()
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return incremental
+
+def apply_branding(input_path, output_filename, deterministic=False, incremental=False, **options):
+    """
+    Brands a PDF file (see brand_document for the options) and saves the result
+    next to the input, or at output_filename if it is an absolute path.
+    deterministic=True makes identical inputs and options give identical bytes.
+    incremental=True appends the branding to a copy of the input instead of
+    rewriting the whole file (much less I/O for big scanned books).
+    """
+    input_path = os.path.abspath(input_path)
+    if not os.path.exists(input_path):
+        print(f"Skipping: {input_path} (File not found)")
+        return None
+
+    print(f"Processing: {input_path}...")
+    if options.get("qr"):
+        options.setdefault("doc_id", document_id(input_path))
+    output_dir = os.path.dirname(input_path)
+    output_path = os.path.join(output_dir, output_filename)
+
+    if incremental and os.path.abspath(output_path) != input_path:
+        if not apply_branding_incremental(input_path, output_path, deterministic, **options):
+            print("  Incremental save not possible, wrote the full file instead.")
+        print(f"Saved: {output_path}")
+        print("-" * 30)
+        return output_path
 
-    # Save
-    doc.save(output_path)
+    doc, release_input = open_pdf(input_path)
+    # Save under a temporary name, so an interrupted save never leaves a truncated PDF behind
+    partial_path = f"{output_path}.partial"
+    try:
+        brand_document(doc, **options)
+        if deterministic:
+            make_reproducible(doc, input_path, options)
+        doc.save(partial_path, no_new_id=deterministic)
+        os.replace(partial_path, output_path)
+    finally:
+        # Also on errors: long-lived workers would otherwise keep the document and the mapping
+        doc.close()
+        release_input()
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
     print(f"Saved: {output_path}")
     print("-" * 30)
+    return output_path
 
-if __name__ == "__main__":
+def brand_to_bytes(input_path, deterministic=False, incremental=False, **options):
+    """
+    Brands a PDF file and returns the branded PDF as bytes instead of saving it.
+    incremental is accepted (and ignored) so apply_branding's options can be
+    passed as they are: the bytes are always a full save.
+    """
+    if options.get("qr"):
+        options.setdefault("doc_id", document_id(input_path))
+    doc, release_input = open_pdf(input_path)
+    try:
+        brand_document(doc, **options)
+        if deterministic:
+            make_reproducible(doc, input_path, options)
+        return doc.tobytes(no_new_id=deterministic)
+    finally:
+        doc.close()
+        release_input()
+
+def brand_stream(source, target, **options):
+    """
+    Pipe mode: brands the PDF read from the binary stream source (e.g.
+    sys.stdin.buffer) and writes the branded PDF to target. A PDF can only be
+    parsed once it is complete (the cross-reference table is at the end), so
+    the input is buffered in memory; nothing is written to disk.
+    Returns the number of bytes written.
+    """
+    import fitz
+    data = source.read()
+    if not data:
+        raise ValueError("No PDF data on standard input")
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        brand_document(doc, **options)
+        output = doc.tobytes()
+    finally:
+        doc.close()
+    target.write(output)
+    target.flush()
+    return len(output)
+
+def pick_file():
+    """
+    Opens a file picker window and returns the chosen path ("" if cancelled
+    or if tkinter is not available).
+    """
+    try:
+        import tkinter as tk
+        from tkinter import filedialog
+    except ImportError:
+        print("tkinter is not available, falling back to the terminal.")
+        return ""
+    print("Select the PDF to brand (a file picker window will open)...")
+    root = tk.Tk()
+    root.withdraw()
+    input_path = filedialog.askopenfilename(
+        title="Select PDF to brand",
+        filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+    )
+    root.destroy()
+    if not input_path:
+        print("No file selected in dialog.")
+    return input_path
+
+def interactive(gui=False):
+    """
+    Asks for the input file (in a file picker with gui=True) and options, then brands it.
+    """
     print("Starting PDF Branding V2...")
-    input_path = None
-    if filedialog:
-        print("Select the PDF to brand (a file picker window will open)...")
-        root = tk.Tk()
-        root.withdraw()
-        input_path = filedialog.askopenfilename(
-            title="Select PDF to brand",
-            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
-        )
-        root.destroy()
-        if not input_path:
-            print("No file selected in dialog.")
+    input_path = pick_file() if gui else None
     if not input_path:
         input_path = input("Enter the full path of the PDF to brand: ").strip()
     if not input_path:
@@ -179,5 +708,55 @@ if __name__ == "__main__":
         ).strip().lower()
         logos_all_pages = logo_preference in ("a", "all", "y", "yes", "")
 
-        apply_branding(input_path, output_filename, logos_all_pages)
-        print("All done! Output saved next to the input file.")
\ No newline at end of file
+        apply_branding(input_path, output_filename, logos_all_pages=logos_all_pages)
+        print("All done! Output saved next to the input file.")
+
+if __name__ == "__main__":
+    import argparse
+    import contextlib
+    parser = argparse.ArgumentParser(description="Brand PDFs. Without input files, asks in the terminal.")
+    parser.add_argument("inputs", nargs="*",
+                        help="PDF files to brand (saved as DBG_<name> next to each input), "
+                             "or - to read a PDF from stdin and write the branded PDF to stdout")
+    parser.add_argument("--first-page-logos", action="store_true", help="put the header logos on the first page only")
+    parser.add_argument("--gui", action="store_true", help="choose the PDF in a file picker window (needs tkinter)")
+    parser.add_argument("--profile", metavar="DIR", nargs="?", const="profiles_output", default=None,
+                        help="profile each file with cProfile and write the reports to DIR (default: profiles_output)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="with --profile, also record the top memory allocations (slower)")
+    args = parser.parse_args()
+    if args.trace_memory and not args.profile:
+        parser.error("--trace-memory needs --profile")
+    if "-" in args.inputs and len(args.inputs) > 1:
+        parser.error("- (stdin) cannot be combined with other inputs")
+    if args.gui and args.inputs:
+        parser.error("--gui picks the input itself, do not pass input files")
+
+    if args.inputs == ["-"]:
+        # Pipe mode: the PDF goes to stdout, so every message goes to stderr
+        output = sys.stdout.buffer
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                if args.profile:
+                    import profiling
+                    profiling.profile_call("stdin", brand_stream, sys.stdin.buffer, output, profile_dir=args.profile,
+                                           trace_memory=args.trace_memory, logos_all_pages=not args.first_page_logos)
+                else:
+                    brand_stream(sys.stdin.buffer, output, logos_all_pages=not args.first_page_logos)
+            except Exception as error:  # MuPDF raises several error types for broken input
+                print(f"Error: {error}", file=sys.stderr)
+                sys.exit(1)
+        sys.exit(0)
+    if not args.inputs:
+        interactive(gui=args.gui)
+    for input_path in args.inputs:
+        output_filename = f"DBG_{os.path.basename(input_path)}"
+        if args.profile:
+            import profiling
+            profiling.profile_call(
+                document_id(input_path), apply_branding, input_path, output_filename,
+                profile_dir=args.profile, trace_memory=args.trace_memory,
+                logos_all_pages=not args.first_page_logos,
+            )
+        else:
+            apply_branding(input_path, output_filename, logos_all_pages=not args.first_page_logos)
\ No newline at end of file
@@ -0,0 +1,232 @@
+import os
+import math
+import shutil
+import tempfile
+import statistics
+import time
+
+import fitz  # PyMuPDF
+
+import branding
+
+# --- Configuration ---
+SAMPLE_FILES = 12   # Files actually branded (sample pages only); the rest are extrapolated
+SAMPLE_PAGES = 5    # Pages branded per sampled file, spread from first to last
+CALIBRATION_PAGES = 9  # Blank pages branded to separate the per-file cost from the per-page cost
+REPEATS = 5         # Runs per blank PDF in the calibration (the median is kept)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def blank_doc(pages):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page(width=595, height=842)
+    return doc
+
+
+def calibrate(options, output_dir=None):
+    """
+    Measures what branding costs on this machine for any file, whatever its
+    content, by branding blank 1-page and CALIBRATION_PAGES-page PDFs the
+    way the batch does: open from disk, brand, save into output_dir (or a
+    temporary folder). Returns (file_seconds, brand_seconds, fixed_bytes):
+    the end-to-end cost of a file without pages, the part of it spent in
+    brand_document, and the bytes every output carries (logos and watermark).
+    """
+    runs = {}
+    folder = tempfile.mkdtemp(dir=existing_dir(output_dir) if output_dir else None, prefix=".estimate-")
+    try:
+        for pages in (1, CALIBRATION_PAGES):
+            input_path = os.path.join(folder, f"blank_{pages}.pdf")
+            doc = blank_doc(pages)
+            doc.save(input_path)
+            doc.close()
+            for repeat in range(REPEATS):
+                # A new file every time: overwriting one reuses its cached pages and looks faster than a batch
+                output_path = os.path.join(folder, f"branded_{pages}_{repeat}.pdf")
+                start = time.perf_counter()
+                doc, release_input = branding.open_pdf(input_path)
+                _, brand_seconds = timed(branding.brand_document, doc, **options)
+                doc.save(output_path)
+                doc.close()
+                release_input()
+                runs.setdefault(pages, []).append((time.perf_counter() - start, brand_seconds))
+            runs[pages] = (
+                statistics.median(total for total, _ in runs[pages]),
+                statistics.median(brand for _, brand in runs[pages]),
+                os.path.getsize(output_path) - os.path.getsize(input_path),
+            )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    extra = CALIBRATION_PAGES - 1
+    (one_total, one_brand, one_bytes), (many_total, many_brand, many_bytes) = runs[1], runs[CALIBRATION_PAGES]
+    return (
+        max(0.0, one_total - (many_total - one_total) / extra),
+        max(0.0, one_brand - (many_brand - one_brand) / extra),
+        max(0, one_bytes - (many_bytes - one_bytes) // extra),
+    )
+
+
+def sample_pages(page_count, count=SAMPLE_PAGES):
+    if page_count <= count:
+        return list(range(page_count))
+    if count == 1:
+        return [0]
+    return sorted({round(i * (page_count - 1) / (count - 1)) for i in range(count)})
+
+
+def sample_file(job, options, brand_seconds_fixed, fixed_bytes):
+    """
+    Keeps only a few pages of the job's input and brands them. Returns
+    rates measured on real content:
+      seconds_per_page   branding time per page, without the fixed cost
+      bytes_per_page     bytes branding adds (negative if images shrink)
+      save_per_byte      time to serialise one byte of the file's own content
+    """
+    sample = fitz.open(job["input"])
+    pages = sample_pages(sample.page_count)
+    # select() keeps the original objects; pages copied with insert_pdf()
+    # brand about 1.5x slower than the same pages in the real file
+    sample.select(pages)
+
+    plain = len(sample.tobytes(garbage=1))  # garbage=1 leaves the dropped pages out
+    _, brand_seconds = timed(branding.brand_document, sample, **options)
+    branded, save_seconds = timed(sample.tobytes, garbage=1)
+    sample.close()
+
+    return {
+        "seconds_per_page": max(0.0, brand_seconds - brand_seconds_fixed) / len(pages),
+        "bytes_per_page": (len(branded) - plain - fixed_bytes) / len(pages),
+        "save_per_byte": save_seconds / len(branded),
+    }
+
+
+def density(job):
+    """
+    Bytes per page, on a log scale: separates scanned books from text
+    worksheets, which cost very different amounts per page.
+    """
+    return math.log10(1 + job["bytes"] / max(1, job["pages"]))
+
+
+def pick_samples(jobs, count=SAMPLE_FILES):
+    """
+    Spreads the sample over the range of bytes per page, so light and heavy
+    files are both measured.
+    """
+    ordered = sorted(jobs, key=density)
+    if len(ordered) <= count:
+        return ordered
+    return [ordered[round(i * (len(ordered) - 1) / (count - 1))] for i in range(count)]
+
+
+def estimate_batch(jobs, options=None, profile_set=None, workers=1, sample_files=SAMPLE_FILES, output_dir=None):
+    """
+    Estimates branding time and output size without writing any output
+    (the calibration files are temporary and removed again).
+
+    The per-file cost is calibrated end to end on blank PDFs saved into
+    output_dir, sample_files files are branded on SAMPLE_PAGES pages each,
+    and every other file borrows the rates of the sampled file closest to it
+    in bytes per page. A file is then estimated as
+        output  = bytes + fixed_bytes + pages * bytes_per_page
+        seconds = file_seconds + pages * seconds_per_page
+                  + (output - fixed_bytes) * save_per_byte
+    Each job gets "estimate" = {"seconds", "output_bytes", "sampled"}. Returns
+    a summary dict for the batch; wall time assumes longest-first scheduling
+    on workers processes (at most one per CPU).
+    """
+    options = {key: value for key, value in (options or {}).items()
+               if key not in ("deterministic", "incremental", "profiles")}
+    for job in jobs:
+        job["bytes"] = job.get("bytes") or os.path.getsize(job["input"])
+
+    calibrations = {}  # Profiles brand with different assets and footers
+    measured = []
+    failed = []
+    for job in pick_samples(jobs, sample_files):
+        job_options = dict(options)
+        if job.get("profile") and profile_set:
+            job_options["profile"] = profile_set[job["profile"]]
+        key = job.get("profile")
+        if key not in calibrations:
+            warm = blank_doc(1)
+            branding.brand_document(warm, **job_options)  # Load the assets outside the timings
+            warm.close()
+            calibrations[key] = calibrate(job_options, output_dir)
+        try:
+            rates = sample_file(job, job_options, *calibrations[key][1:])
+        except Exception as error:  # Estimating must not stop on one broken file
+            failed.append((job, repr(error)))
+            continue
+        measured.append((density(job), rates))
+        job["estimate"] = {"sampled": True}
+        job["rates"] = rates
+
+    if not measured:
+        raise RuntimeError("no sample file could be branded: " + "; ".join(message for _, message in failed))
+
+    for job in jobs:
+        rates = job.pop("rates", None) or min(measured, key=lambda item: abs(item[0] - density(job)))[1]
+        file_seconds, _, fixed_bytes = calibrations.get(job.get("profile"), next(iter(calibrations.values())))
+        output_bytes = max(fixed_bytes, round(job["bytes"] + fixed_bytes + job["pages"] * rates["bytes_per_page"]))
+        seconds = (file_seconds + job["pages"] * rates["seconds_per_page"]
+                   + (output_bytes - fixed_bytes) * rates["save_per_byte"])
+        job["estimate"] = {
+            "seconds": round(seconds, 3),
+            "output_bytes": output_bytes,
+            "sampled": job.get("estimate", {}).get("sampled", False),
+        }
+
+    # Longest job first onto the least loaded worker; workers beyond the CPU count do not add speed
+    loads = [0.0] * max(1, min(workers, os.cpu_count() or 1))
+    for seconds in sorted((job["estimate"]["seconds"] for job in jobs), reverse=True):
+        loads[loads.index(min(loads))] += seconds
+    return {
+        "files": len(jobs),
+        "pages": sum(job["pages"] for job in jobs),
+        "input_bytes": sum(job["bytes"] for job in jobs),
+        "output_bytes": sum(job["estimate"]["output_bytes"] for job in jobs),
+        "cpu_seconds": round(sum(job["estimate"]["seconds"] for job in jobs), 1),
+        "wall_seconds": round(max(loads), 1),
+        "sampled": len(measured),
+        "sample_failures": failed,
+    }
+
+
+def existing_dir(path):
+    path = os.path.abspath(path)
+    while not os.path.isdir(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def free_bytes(path):
+    """
+    Free disk space where path is (or would be) created, or None if unknown.
+    """
+    try:
+        return shutil.disk_usage(existing_dir(path)).free
+    except OSError:
+        return None
+
+
+def print_estimate(jobs, summary):
+    print(f"{'Pages':>6}{'MB in':>9}{'MB out':>9}{'Seconds':>9}  File")
+    for job in sorted(jobs, key=lambda job: job["estimate"]["seconds"], reverse=True):
+        estimate = job["estimate"]
+        mark = "*" if estimate["sampled"] else " "
+        print(f"{job['pages']:>6}{job['bytes'] / 1e6:>9.2f}{estimate['output_bytes'] / 1e6:>9.2f}"
+              f"{estimate['seconds']:>9.2f}{mark} {job['input']}")
+    for job, message in summary["sample_failures"]:
+        print(f"Sample failed: {job['input']} ({message})")
+    print("-" * 30)
+    print(f"{summary['files']} file(s), {summary['pages']} page(s), {summary['sampled']} sampled (*).")
+    print(f"Estimated time: {summary['wall_seconds']:.1f}s wall ({summary['cpu_seconds']:.1f}s of branding work).")
+    print(f"Estimated output: {summary['output_bytes'] / 1e6:.1f} MB (inputs {summary['input_bytes'] / 1e6:.1f} MB).")
@@ -0,0 +1,145 @@
+import io
+import os
+import zlib
+import fitz  # PyMuPDF
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# --- Configuration ---
+TARGET_DPI = 150         # Enough for phones and for printing worksheets
+MIN_SCALE = 0.8          # Only downsample when the image shrinks to 80% of its width or less
+MIN_IMAGE_BYTES = 20000  # Smaller images are not worth the work
+JPEG_QUALITY = 80
+THREADS = min(4, os.cpu_count() or 1)
+
+
+def heavy_images(doc, target_dpi=TARGET_DPI):
+    """
+    Finds embedded images whose effective resolution on the page is above
+    target_dpi. An image shown several times must stay sharp at its largest
+    placement. Returns {xref: (target_width, target_height)}.
+    """
+    needed = {}
+    for page in doc:
+        for info in page.get_image_info(xrefs=True):
+            xref = info["xref"]
+            if not xref or info["width"] <= 0:
+                continue  # Inline images have no xref and cannot be replaced
+            bbox = fitz.Rect(info["bbox"])
+            scale = min(1.0, max(bbox.width, bbox.height) / 72 * target_dpi / max(info["width"], info["height"]))
+            if xref not in needed or scale > needed[xref][1]:
+                needed[xref] = (scale, info["width"], info["height"])
+
+    found = {}
+    for xref, (scale, width, height) in needed.items():
+        if scale > MIN_SCALE or stored_bytes(doc, xref) < MIN_IMAGE_BYTES:
+            continue
+        if doc.xref_get_key(xref, "ImageMask")[1] == "true" or doc.xref_get_key(xref, "BitsPerComponent")[1] == "1":
+            continue  # Black-and-white scans: JPEG would make them bigger and blurry
+        found[xref] = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return found
+
+
+def stored_bytes(doc, xref):
+    """
+    Bytes an image takes in the file, including its transparency mask.
+    """
+    size = len(doc.xref_stream_raw(xref) or b"")
+    kind, smask = doc.xref_get_key(xref, "SMask")
+    if kind == "xref":
+        size += len(doc.xref_stream_raw(int(smask.split()[0])) or b"")
+    return size
+
+
+def read_pixels(doc, xref):
+    """
+    Decodes an image (with its mask) to (mode, width, height, samples).
+    Runs on the main thread: PyMuPDF objects must not be shared with threads.
+    """
+    pix = fitz.Pixmap(doc, xref)
+    kind, smask = doc.xref_get_key(xref, "SMask")
+    if pix.colorspace and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if kind == "xref" and not pix.alpha:
+        pix = fitz.Pixmap(pix, fitz.Pixmap(doc, int(smask.split()[0])))
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[pix.n]
+    return mode, pix.width, pix.height, pix.samples
+
+
+def recompress(mode, width, height, samples, target_width, target_height):
+    """
+    Downsamples the pixels and encodes the colour as JPEG and the
+    transparency (if any) as a Flate-compressed mask.
+    Pure Pillow/zlib work, safe to run in a thread.
+    Returns (jpeg_bytes, colour_mode, mask_bytes or None).
+    """
+    image = Image.frombytes(mode, (width, height), samples)
+    image = image.resize((target_width, target_height), Image.LANCZOS)
+    mask = None
+    if "A" in mode:
+        mask = zlib.compress(image.getchannel("A").tobytes())
+        image = image.convert(mode[:-1])
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return out.getvalue(), image.mode, mask
+
+
+def write_image(doc, xref, width, height, jpeg, mode, mask):
+    """
+    Overwrites the image object in place, so every page showing it picks up
+    the new version. An existing mask object is reused for the new mask.
+    """
+    colorspace = "/DeviceGray" if mode == "L" else "/DeviceRGB"
+    kind, smask = doc.xref_get_key(xref, "SMask")
+    image_dict = f"/Type/XObject/Subtype/Image/Width {width}/Height {height}/ColorSpace {colorspace}/BitsPerComponent 8"
+    if mask is not None:
+        mask_xref = int(smask.split()[0]) if kind == "xref" else doc.get_new_xref()
+        doc.update_object(mask_xref, f"<<{image_dict.replace(colorspace, '/DeviceGray')}>>")
+        doc.update_stream(mask_xref, mask, compress=False)
+        doc.xref_set_key(mask_xref, "Filter", "/FlateDecode")
+        image_dict += f"/SMask {mask_xref} 0 R"
+    doc.update_object(xref, f"<<{image_dict}>>")
+    doc.update_stream(xref, jpeg, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+
+
+def optimise_images(doc, target_dpi=TARGET_DPI, threads=THREADS):
+    """
+    Downsamples and recompresses the heavy images of an open document.
+    Decoding and replacing happen on the calling thread, the resizing and
+    encoding on a thread pool. An image is only replaced when the new version
+    is smaller. Returns (images_replaced, bytes_saved).
+    """
+    candidates = heavy_images(doc, target_dpi)
+    if not candidates:
+        return 0, 0
+
+    replaced = saved = 0
+    in_flight = {}
+    pending = list(candidates.items())
+
+    def finish(xref, future):
+        nonlocal replaced, saved
+        jpeg, mode, mask = future.result()
+        before = stored_bytes(doc, xref)
+        after = len(jpeg) + len(mask or b"")
+        if after < before:
+            width, height = candidates[xref]
+            write_image(doc, xref, width, height, jpeg, mode, mask)
+            replaced += 1
+            saved += before - after
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while pending or in_flight:
+            # Keep only a few decoded images in memory at a time
+            while pending and len(in_flight) < threads * 2:
+                xref, (target_width, target_height) = pending.pop(0)
+                try:
+                    pixels = read_pixels(doc, xref)
+                except (RuntimeError, ValueError, KeyError):
+                    continue  # Unusual colour space or broken image: leave it as it is
+                in_flight[xref] = pool.submit(recompress, *pixels, target_width, target_height)
+            if in_flight:
+                xref = next(iter(in_flight))
+                finish(xref, in_flight.pop(xref))
+    return replaced, saved
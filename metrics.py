@@ -0,0 +1,165 @@
+import os
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+PREFIX = "dbg_branding_"
+FILE_SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+PAGE_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+TEXTFILE_INTERVAL = 5  # Seconds between textfile rewrites while a batch runs
+
+HELP = {
+    "files_total": ("counter", "Files processed, by result"),
+    "pages_total": ("counter", "Pages branded"),
+    "bytes_in_total": ("counter", "Input bytes of branded files"),
+    "bytes_out_total": ("counter", "Output bytes written"),
+    "file_seconds": ("histogram", "Time to brand one file"),
+    "page_seconds": ("histogram", "Branding time per page"),
+    "queue_depth": ("gauge", "Files waiting to be branded"),
+    "workers_busy": ("gauge", "Workers branding a file right now"),
+    "worker_rss_bytes": ("gauge", "Resident memory of each worker process"),
+}
+
+
+def number_text(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """
+    A small Prometheus-style metrics registry: counters, gauges and
+    histograms, rendered in the Prometheus text format. Export it with
+    write_textfile() (node_exporter textfile collector) or serve() (a local
+    /metrics endpoint). Safe to read from the HTTP thread while updating.
+    """
+
+    def __init__(self, textfile=None):
+        self.textfile = textfile
+        self.lock = threading.Lock()
+        self.values = {}      # (name, labels) -> value, for counters and gauges
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self.buckets = {"file_seconds": FILE_SECONDS_BUCKETS, "page_seconds": PAGE_SECONDS_BUCKETS}
+        self.server = None
+        self.written = 0.0
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = value
+
+    def remove(self, name, **labels):
+        with self.lock:
+            self.values.pop((name, tuple(sorted(labels.items()))), None)
+
+    def observe(self, name, value, count=1, **labels):
+        """
+        Records value in a histogram; count records it that many times (e.g.
+        the average page time once per page of a file).
+        """
+        key = (name, tuple(sorted(labels.items())))
+        bounds = self.buckets[name]
+        with self.lock:
+            counts, total, observations = self.histograms.get(key, ([0] * len(bounds), 0.0, 0))
+            for index in range(bisect.bisect_left(bounds, value), len(bounds)):
+                counts[index] += count
+            self.histograms[key] = (counts, total + value * count, observations + count)
+
+    def record_file(self, job, status, bytes_out=0):
+        """
+        Updates the per-file metrics for one finished batch job.
+        """
+        self.inc("files_total", status=status)
+        if status != "done":
+            return
+        pages = job.get("pages") or 0
+        seconds = job.get("seconds")
+        self.inc("pages_total", pages)
+        try:
+            self.inc("bytes_in_total", os.path.getsize(job["input"]))
+        except OSError:
+            pass
+        self.inc("bytes_out_total", bytes_out)
+        if seconds is not None:
+            self.observe("file_seconds", seconds)
+            if pages:
+                self.observe("page_seconds", seconds / pages, count=pages)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            names = sorted({name for name, _ in self.values} | {name for name, _ in self.histograms})
+            for name in names:
+                kind, help_text = HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                for (metric, labels), value in sorted(self.values.items()):
+                    if metric == name:
+                        lines.append(f"{PREFIX}{name}{label_text(dict(labels))} {number_text(value)}")
+                for (metric, labels), (counts, total, count) in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(self.buckets[name], counts):
+                        lines.append(f"{PREFIX}{name}_bucket{label_text({**dict(labels), 'le': f'{bound:g}'})} {bucket_count}")
+                    lines.append(f"{PREFIX}{name}_bucket{label_text({**dict(labels), 'le': '+Inf'})} {count}")
+                    lines.append(f"{PREFIX}{name}_sum{label_text(dict(labels))} {number_text(total)}")
+                    lines.append(f"{PREFIX}{name}_count{label_text(dict(labels))} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, force=True):
+        """
+        Writes the metrics to the textfile (if one was given) atomically, as
+        the node_exporter textfile collector expects. With force=False it is
+        only rewritten every TEXTFILE_INTERVAL seconds.
+        """
+        if not self.textfile or (not force and time.monotonic() - self.written < TEXTFILE_INTERVAL):
+            return
+        self.written = time.monotonic()
+        partial = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(partial, self.textfile)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves GET /metrics on a background thread until close().
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep scrapes out of the batch output
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def close(self):
+        self.write_textfile()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,181 @@
+import fitz  # PyMuPDF
+import os
+import re
+import csv
+import time
+import argparse
+
+import branding
+
+# --- Configuration ---
+OUTPUT_DIR = "personalised_output"
+STAMP_TEMPLATE = "Issued to: {name}"
+STAMP_FONTSIZE = 7
+STAMP_COLOR = (0.35, 0.35, 0.35)
+STAMP_OFFSET = 12  # Baseline distance from the bottom edge, below the footer
+
+
+def read_recipients(path):
+    """
+    Reads students from a CSV with a header row (e.g. "name,roll") or from a
+    plain text file with one name per line. Returns a list of dicts.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".csv"):
+            return [
+                {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+                for row in csv.DictReader(f)
+            ]
+        return [{"name": line.strip()} for line in f if line.strip()]
+
+
+def copy_name(base_name, recipient, number):
+    """
+    Output file name for one copy, e.g. DBG_Maths_Class_1_R023.pdf.
+    """
+    label = recipient.get("roll") or recipient.get("name") or str(number)
+    label = re.sub(r"[^A-Za-z0-9_-]+", "_", label).strip("_") or str(number)
+    stem = os.path.splitext(base_name)[0]
+    return f"{stem}_{label}.pdf"
+
+
+def copy_names(base_name, recipients):
+    """
+    copy_name for every recipient, in order. Recipients with the same roll
+    number or name (or names that only differ in non-Latin letters) get
+    _2, _3, ... instead of overwriting each other's copy.
+    """
+    names, taken = [], set()
+    for number, recipient in enumerate(recipients, start=1):
+        base, ext = os.path.splitext(copy_name(base_name, recipient, number))
+        name, counter = base + ext, 2
+        while name.lower() in taken:  # Also distinct on case-insensitive file systems
+            name = f"{base}_{counter}{ext}"
+            counter += 1
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+
+def pdf_string(text):
+    """
+    Escapes Latin-1 text for a PDF literal string (the built-in Helvetica
+    only covers Latin-1; other text goes through shaped_stamp).
+    """
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def shaped_stamp(doc, text, first_page_only=False):
+    """
+    Stamps text Helvetica cannot show (e.g. Hindi names) the way the branded
+    footer shows it: shaped once with HarfBuzz in the footer font, subset,
+    and placed on every page as one shared Form XObject.
+    """
+    scratch, clip, baseline = branding.shaped_text(text, STAMP_FONTSIZE, branding.FOOTER_FONT, STAMP_COLOR)
+    for page_num, page in enumerate(doc):
+        if first_page_only and page_num > 0:
+            break
+        rect = page.rect
+        x0 = (rect.width - clip.width) / 2
+        y0 = rect.height - STAMP_OFFSET - baseline
+        page.show_pdf_page(fitz.Rect(x0, y0, x0 + clip.width, y0 + clip.height), scratch, 0, clip=clip)
+    scratch.close()
+
+
+def stamp_copy(path, text, first_page_only=False):
+    """
+    Writes the stamp text into an existing branded file as an incremental
+    update. The stamp is a small extra content stream appended to each page,
+    using the Helvetica resource the branded footer already added, so the
+    existing page content does not need to be parsed or rewritten.
+    """
+    doc = fitz.open(path)
+    if branding.needs_unicode_font(text):
+        shaped_stamp(doc, text, first_page_only)
+        doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+        doc.close()
+        return
+    text_len = fitz.get_text_length(text, fontname="helv", fontsize=STAMP_FONTSIZE)
+    color = " ".join(f"{c:g}" for c in STAMP_COLOR)
+    for page_num, page in enumerate(doc):
+        if first_page_only and page_num > 0:
+            break
+        rect = page.rect
+        if doc.xref_get_key(page.xref, "Resources/Font/helv")[0] == "null":
+            # Not a branded page: let PyMuPDF add the font and text
+            page.insert_text(
+                ((rect.width - text_len) / 2, rect.height - STAMP_OFFSET),
+                text, fontsize=STAMP_FONTSIZE, fontname="helv", color=STAMP_COLOR,
+            )
+            continue
+
+        # Page coordinates (top-left origin) to PDF user space
+        origin = fitz.Point((rect.width - text_len) / 2, rect.height - STAMP_OFFSET) * ~page.transformation_matrix
+        stream = f"q BT /helv {STAMP_FONTSIZE} Tf {color} rg {origin.x:.2f} {origin.y:.2f} Td {pdf_string(text)} Tj ET Q"
+        xref = doc.get_new_xref()
+        doc.update_object(xref, "<<>>")
+        doc.update_stream(xref, stream.encode("latin-1"))
+
+        kind, value = doc.xref_get_key(page.xref, "Contents")
+        existing = value.strip("[]") if kind == "array" else value
+        doc.xref_set_key(page.xref, "Contents", f"[{existing} {xref} 0 R]")
+    doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    doc.close()
+
+
+def personalise(input_path, recipients, output_dir, template=STAMP_TEMPLATE, first_page_only=False, **options):
+    """
+    Brands the input once, then makes one stamped copy per recipient.
+    Each copy is a (reflink) copy of the shared branded base plus a tiny
+    incremental update, so the heavy branding work is not repeated.
+    Returns the list of written paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = f"DBG_{os.path.basename(input_path)}"
+    base_path = os.path.abspath(os.path.join(output_dir, f".base_{base_name}"))
+
+    # The base is copied once per recipient, so it is worth compressing it
+    # (lossless) once: every copy then reads and writes far fewer bytes.
+    doc, release_input = branding.open_pdf(input_path)
+    branding.brand_document(doc, **options)
+    doc.save(base_path, deflate=True)
+    doc.close()
+    release_input()
+
+    written = []
+    try:
+        for recipient, name in zip(recipients, copy_names(base_name, recipients)):
+            target = os.path.join(output_dir, name)
+            branding.clone_file(base_path, target)
+            fields = {"name": "", "roll": "", **recipient}
+            stamp_copy(target, template.format(**fields), first_page_only)
+            written.append(target)
+    finally:
+        os.remove(base_path)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brand a PDF once and make a stamped copy per student.")
+    parser.add_argument("input", help="PDF to brand")
+    parser.add_argument("recipients", help="CSV with a header row (name, roll, ...) or a text file with one name per line")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help=f"output folder (default: {OUTPUT_DIR})")
+    parser.add_argument("--template", default=STAMP_TEMPLATE, help='stamp text, e.g. "Roll {roll} - {name}"')
+    parser.add_argument("--first-page-stamp", action="store_true", help="stamp the first page only")
+    parser.add_argument("--first-page-logos", action="store_true", help="put the header logos on the first page only")
+    args = parser.parse_args()
+
+    recipients = read_recipients(args.recipients)
+    start = time.monotonic()
+    written = personalise(
+        args.input,
+        recipients,
+        args.output_dir,
+        template=args.template,
+        first_page_only=args.first_page_stamp,
+        logos_all_pages=not args.first_page_logos,
+    )
+    elapsed = time.monotonic() - start
+    print("=" * 30)
+    print(f"Wrote {len(written)} personalised copies to {args.output_dir} in {elapsed:.1f}s.")
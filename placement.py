@@ -0,0 +1,249 @@
+import fitz  # PyMuPDF
+import numpy as np  # Requires: pip install numpy
+
+# --- Configuration ---
+GRID_CELL = 12          # Size of one occupancy grid cell, in points
+KEEP_CLEAR_TOP = 110    # Header logos live above this line
+KEEP_CLEAR_BOTTOM = 50  # Footer lives below (page height - this)
+KEEP_CLEAR_SIDE = 30    # Keep the watermark off the page edges
+LAYOUT_CACHE_SIZE = 256
+
+# Chosen watermark rects, keyed by page layout (page size + content boxes).
+# Worksheets repeat the same layout on many pages, so this is hit often.
+_LAYOUT_CACHE = {}
+
+
+def content_boxes(page):
+    """
+    Returns the text block and image rects of a page as an (n, 4) float array.
+    """
+    boxes = [block[:4] for block in page.get_text("blocks")]
+    boxes.extend(info["bbox"] for info in page.get_image_info())
+    if not boxes:
+        return np.empty((0, 4))
+    return np.array(boxes, dtype=float)
+
+
+def occupancy_grid(boxes, width, height, cell=GRID_CELL):
+    """
+    Rasterises the boxes onto a coarse grid. Each cell holds the number of
+    boxes covering it. Built with a 2D difference array, so the cost does not
+    depend on how large the boxes are.
+    """
+    rows = int(np.ceil(height / cell))
+    cols = int(np.ceil(width / cell))
+    diff = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    if len(boxes):
+        x0 = np.clip(np.floor(boxes[:, 0] / cell), 0, cols).astype(int)
+        y0 = np.clip(np.floor(boxes[:, 1] / cell), 0, rows).astype(int)
+        x1 = np.clip(np.ceil(boxes[:, 2] / cell), 0, cols).astype(int)
+        y1 = np.clip(np.ceil(boxes[:, 3] / cell), 0, rows).astype(int)
+        np.add.at(diff, (y0, x0), 1)
+        np.add.at(diff, (y0, x1), -1)
+        np.add.at(diff, (y1, x0), -1)
+        np.add.at(diff, (y1, x1), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:rows, :cols]
+
+
+def least_occupied_window(grid, win_rows, win_cols, row_range, col_range):
+    """
+    Scores every window position with a summed-area table and returns the
+    (row, col) of the emptiest one. Ties go to the position nearest the
+    centre of the allowed area, so an empty page keeps a centred watermark.
+    """
+    table = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1), dtype=np.int64)
+    table[1:, 1:] = (grid > 0).cumsum(axis=0).cumsum(axis=1)
+    sums = table[win_rows:, win_cols:] - table[:-win_rows, win_cols:] - table[win_rows:, :-win_cols] + table[:-win_rows, :-win_cols]
+
+    row_lo, row_hi = row_range
+    col_lo, col_hi = col_range
+    sums = sums[row_lo:row_hi + 1, col_lo:col_hi + 1]
+
+    row_idx, col_idx = np.indices(sums.shape)
+    distance = (row_idx - (sums.shape[0] - 1) / 2) ** 2 + (col_idx - (sums.shape[1] - 1) / 2) ** 2
+    best = np.lexsort((distance.ravel(), sums.ravel()))[0]
+    return row_lo + best // sums.shape[1], col_lo + best % sums.shape[1]
+
+
+def adaptive_watermark_rect(page, wm_width, wm_height, cell=GRID_CELL):
+    """
+    Returns the watermark rect covering the least text and images on the page,
+    between the header and footer areas. Falls back to the page centre when
+    the page is too small for a search.
+    """
+    rect = page.rect
+    boxes = content_boxes(page)
+    key = (round(rect.width), round(rect.height), wm_width, wm_height, np.round(boxes).astype(int).tobytes())
+    if key in _LAYOUT_CACHE:
+        return fitz.Rect(_LAYOUT_CACHE[key])
+
+    win_rows = int(np.ceil(wm_height / cell))
+    win_cols = int(np.ceil(wm_width / cell))
+    grid = occupancy_grid(boxes, rect.width, rect.height, cell)
+
+    row_lo = int(np.ceil(KEEP_CLEAR_TOP / cell))
+    row_hi = int((rect.height - KEEP_CLEAR_BOTTOM - wm_height) // cell)
+    col_lo = int(np.ceil(KEEP_CLEAR_SIDE / cell))
+    col_hi = int((rect.width - KEEP_CLEAR_SIDE - wm_width) // cell)
+    if row_hi < row_lo or col_hi < col_lo:
+        x = (rect.width - wm_width) / 2
+        y = (rect.height - wm_height) / 2
+    else:
+        row, col = least_occupied_window(grid, win_rows, win_cols, (row_lo, row_hi), (col_lo, col_hi))
+        x = col * cell
+        y = row * cell
+
+    wm_rect = fitz.Rect(x, y, x + wm_width, y + wm_height)
+    if len(_LAYOUT_CACHE) >= LAYOUT_CACHE_SIZE:
+        _LAYOUT_CACHE.clear()
+    _LAYOUT_CACHE[key] = tuple(wm_rect)
+    return wm_rect
+
+
+# ---------------------------------------------------------
+# Collision-aware header logos and footer
+# ---------------------------------------------------------
+INDEX_CELL = 32            # Bucket size of the spatial index, in points
+BACKGROUND_SHARE = 0.25    # Drawings larger than this share of the page are frames/backgrounds
+LOGO_SIZES = (65, 55, 45)  # Shrink steps for the header logos
+LOGO_TOPS = (40, 25, 12)   # Shift steps towards the top edge
+LOGO_SIDES = (60, 40, 25)  # Shift steps towards the side edges
+FOOTER_OFFSETS = (30, 24, 18)  # Baseline distance from the bottom edge
+FOOTER_FONTSIZES = (9, 8, 7)
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the page. Every box is stored in the buckets it touches,
+    so a query only looks at the few boxes near the queried rect instead of
+    every box on the page.
+    """
+
+    def __init__(self, boxes, cell=INDEX_CELL):
+        self.cell = cell
+        self.boxes = [fitz.Rect(box) for box in boxes]
+        self.buckets = {}
+        for number, box in enumerate(self.boxes):
+            for key in self._keys(box):
+                self.buckets.setdefault(key, []).append(number)
+
+    def _keys(self, rect):
+        cell = self.cell
+        for col in range(int(rect.x0 // cell), int(rect.x1 // cell) + 1):
+            for row in range(int(rect.y0 // cell), int(rect.y1 // cell) + 1):
+                yield col, row
+
+    def hits(self, rect):
+        """
+        Returns the indexed boxes that overlap rect.
+        """
+        rect = fitz.Rect(rect)
+        seen = set()
+        found = []
+        for key in self._keys(rect):
+            for number in self.buckets.get(key, ()):
+                if number not in seen:
+                    seen.add(number)
+                    if self.boxes[number].intersects(rect):
+                        found.append(self.boxes[number])
+        return found
+
+
+def frame_edges(rect, width=2):
+    """
+    The four edge strips of a large rect, so a page frame or background panel
+    only blocks its border and not the area inside it.
+    """
+    return [
+        fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + width),
+        fitz.Rect(rect.x0, rect.y1 - width, rect.x1, rect.y1),
+        fitz.Rect(rect.x0, rect.y0, rect.x0 + width, rect.y1),
+        fitz.Rect(rect.x1 - width, rect.y0, rect.x1, rect.y1),
+    ]
+
+
+def build_page_index(page):
+    """
+    Indexes the text blocks, images and drawings already on the page.
+    """
+    boxes = [fitz.Rect(block[:4]) for block in page.get_text("blocks")]
+    boxes.extend(fitz.Rect(info["bbox"]) for info in page.get_image_info())
+    page_area = abs(page.rect)
+    for drawing in page.get_drawings():
+        rect = drawing["rect"]
+        if abs(rect) > page_area * BACKGROUND_SHARE:
+            boxes.extend(frame_edges(rect))
+        else:
+            boxes.append(rect)
+    # Lines have a zero-height (or zero-width) bbox; give them some thickness
+    boxes = [box + (-0.5, -0.5, 0.5, 0.5) if box.is_empty else box for box in boxes]
+    return SpatialIndex([box for box in boxes if not box.is_empty])
+
+
+def footer_line_gap(fontsize):
+    """
+    Distance between the footer rule and the text baseline (15pt at 9pt text).
+    """
+    return fontsize + 6
+
+
+def footer_band(rect, offset, fontsize):
+    """
+    The area covered by the footer rule and text for a given baseline offset.
+    """
+    footer_y = rect.height - offset
+    return fitz.Rect(20, footer_y - footer_line_gap(fontsize) - 1, rect.width - 20, footer_y + 3)
+
+
+def plan_layout(page, logo_size=65, margin_top=40, margin_side=60, footer_offset=30, fontsize=9):
+    """
+    Finds header logo and footer positions that do not overlap existing page
+    content. Logos are shifted towards the corner first and shrunk only if
+    shifting is not enough; the footer moves down, then uses a smaller font
+    with a tighter rule.
+    When nothing fits, the default position is kept and the collision is
+    reported.
+    Returns a dict with left_rect, right_rect, footer_y, fontsize and collisions.
+    """
+    rect = page.rect
+    index = build_page_index(page)
+    layout = {"collisions": []}
+
+    def left(size, top, side):
+        return fitz.Rect(side, top, side + size, top + size)
+
+    def right(size, top, side):
+        return fitz.Rect(rect.width - side - size, top, rect.width - side, top + size)
+
+    for name, make_rect in (("left_rect", left), ("right_rect", right)):
+        default = make_rect(logo_size, margin_top, margin_side)
+        layout[name] = default
+        candidates = [
+            make_rect(size, top, side)
+            for size in LOGO_SIZES if size <= logo_size
+            for top in LOGO_TOPS if top <= margin_top
+            for side in LOGO_SIDES if side <= margin_side
+        ]
+        for candidate in [default] + candidates:
+            if not index.hits(candidate):
+                layout[name] = candidate
+                break
+        else:
+            layout["collisions"].append(f"{name.split('_')[0]} logo overlaps page content")
+
+    layout["footer_y"] = rect.height - footer_offset
+    layout["fontsize"] = fontsize
+    candidates = [
+        (offset, size)
+        for size in FOOTER_FONTSIZES if size <= fontsize
+        for offset in FOOTER_OFFSETS if offset <= footer_offset
+    ]
+    for offset, size in [(footer_offset, fontsize)] + candidates:
+        if not index.hits(footer_band(rect, offset, size)):
+            layout["footer_y"] = rect.height - offset
+            layout["fontsize"] = size
+            break
+    else:
+        layout["collisions"].append("footer overlaps page content")
+
+    return layout
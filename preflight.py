@@ -0,0 +1,217 @@
+import fitz  # PyMuPDF
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+MAX_FILE_BYTES = 1024 * 1024 * 1024  # Files bigger than 1 GB are rejected
+MAX_PAGES = 5000
+
+# Rough branding cost model (seconds). Every page gets a watermark, two logos
+# and a footer; big embedded images make the final save slower.
+COST_PER_FILE = 0.05
+COST_PER_PAGE = 0.02
+COST_PER_MB = 0.01
+
+
+def stream_length(doc, xref):
+    """
+    Returns the /Length of a stream object without decompressing it.
+    """
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == "int":
+        return int(value)
+    if kind == "xref":  # Indirect length, e.g. "12 0 R"
+        try:
+            return int(doc.xref_object(int(value.split()[0])).strip())
+        except ValueError:
+            return 0
+    return 0
+
+
+def resource_bytes(doc):
+    """
+    Walks the xref table once and sums the stream bytes of images and
+    embedded font files.
+    """
+    image_bytes = 0
+    font_bytes = 0
+    for xref in range(1, doc.xref_length()):
+        if doc.xref_get_key(xref, "Subtype") == ("name", "/Image"):
+            image_bytes += stream_length(doc, xref)
+        elif doc.xref_get_key(xref, "Type") == ("name", "/FontDescriptor"):
+            for key in ("FontFile", "FontFile2", "FontFile3"):
+                kind, value = doc.xref_get_key(xref, key)
+                if kind == "xref":
+                    font_bytes += stream_length(doc, int(value.split()[0]))
+    return image_bytes, font_bytes
+
+
+def page_rotation(doc, page_num):
+    """
+    Reads /Rotate from the page dictionary, following /Parent because the
+    value may be inherited from the page tree.
+    """
+    xref = doc.page_xref(page_num)
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Rotate")
+        if kind == "int":
+            return int(value) % 360
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return 0
+
+
+def estimate_cost(report):
+    return round(
+        COST_PER_FILE
+        + report["pages"] * COST_PER_PAGE
+        + (report["file_bytes"] + report["image_bytes"]) / (1024 * 1024) * COST_PER_MB,
+        3,
+    )
+
+
+def scan_pdf(path):
+    """
+    Opens a PDF with as little parsing as possible and reports everything
+    needed to decide whether (and when) to brand it.
+    """
+    report = {
+        "path": path,
+        "status": "ok",
+        "reason": "",
+        "file_bytes": 0,
+        "pages": 0,
+        "page_sizes": [],
+        "rotations": [],
+        "encrypted": False,
+        "image_bytes": 0,
+        "font_bytes": 0,
+        "cost": 0.0,
+    }
+
+    try:
+        report["file_bytes"] = os.path.getsize(path)
+    except OSError as error:
+        report.update(status="missing", reason=str(error))
+        return report
+
+    if report["file_bytes"] > MAX_FILE_BYTES:
+        report.update(status="too_large", reason=f"{report['file_bytes']} bytes")
+        return report
+
+    try:
+        doc = fitz.open(path)
+    except Exception as error:  # MuPDF raises several error types for broken files
+        report.update(status="corrupt", reason=str(error))
+        return report
+
+    with doc:
+        if doc.needs_pass:
+            report.update(status="encrypted", encrypted=True, reason="password required")
+            return report
+        report["encrypted"] = doc.is_encrypted
+
+        try:
+            report["pages"] = doc.page_count
+            if report["pages"] == 0:
+                report.update(status="empty", reason="no pages")
+                return report
+            if report["pages"] > MAX_PAGES:
+                report.update(status="too_large", reason=f"{report['pages']} pages")
+
+            # Distinct (width, height) pairs keep the report short for long books
+            sizes = set()
+            rotations = set()
+            for page_num in range(report["pages"]):
+                box = doc.page_cropbox(page_num)
+                sizes.add((round(box.width, 1), round(box.height, 1)))
+                rotations.add(page_rotation(doc, page_num))
+            report["page_sizes"] = sorted(sizes)
+            report["rotations"] = sorted(rotations)
+
+            report["image_bytes"], report["font_bytes"] = resource_bytes(doc)
+        except Exception as error:
+            report.update(status="corrupt", reason=str(error))
+            return report
+
+        if doc.is_repaired:
+            report["reason"] = "xref table was repaired"
+
+    report["cost"] = estimate_cost(report)
+    return report
+
+
+def scan_all(paths, workers=1):
+    """
+    Scans every path. With workers > 1 the files are spread over processes.
+    """
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(scan_pdf, paths, chunksize=16))
+    return [scan_pdf(path) for path in paths]
+
+
+def sort_queue(reports):
+    """
+    Keeps only the files that can be branded and orders them largest-first,
+    so that long jobs start early and workers finish at about the same time.
+    """
+    accepted = [report for report in reports if report["status"] == "ok"]
+    return sorted(accepted, key=lambda report: report["cost"], reverse=True)
+
+
+def expand_inputs(inputs):
+    """
+    Expands folders into the PDFs they contain, at any depth. The .pdf suffix
+    matches in any case (scanners often write .PDF); hidden files and folders
+    are skipped.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = []
+            for folder, subfolders, names in os.walk(item):
+                subfolders[:] = [name for name in subfolders if not name.startswith(".")]
+                found.extend(
+                    os.path.join(folder, name) for name in names
+                    if not name.startswith(".") and os.path.splitext(name)[1].lower() == ".pdf"
+                )
+            paths.extend(sorted(found))
+        else:
+            paths.append(item)
+    return paths
+
+
+def print_report(reports):
+    print(f"{'Status':<10}{'Pages':>6}{'MB':>9}{'Images MB':>11}{'Fonts MB':>10}{'Cost s':>8}  File")
+    for report in reports:
+        print(
+            f"{report['status']:<10}{report['pages']:>6}"
+            f"{report['file_bytes'] / 1e6:>9.2f}{report['image_bytes'] / 1e6:>11.2f}"
+            f"{report['font_bytes'] / 1e6:>10.2f}{report['cost']:>8.2f}  {report['path']}"
+        )
+        if report["reason"]:
+            print(f"{'':<10}{report['reason']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Triage PDFs before branding them.")
+    parser.add_argument("inputs", nargs="+", help="PDF files or folders")
+    parser.add_argument("--workers", type=int, default=1, help="number of scanner processes")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = scan_all(expand_inputs(args.inputs), workers=args.workers)
+    queue = sort_queue(reports)
+    rejected = [report for report in reports if report["status"] != "ok"]
+
+    if args.json:
+        json.dump({"queue": queue, "rejected": rejected}, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(queue + rejected)
+        print("-" * 30)
+        print(f"{len(queue)} file(s) ready to brand, {len(rejected)} rejected.")
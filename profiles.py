@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import fnmatch
+import argparse
+import dataclasses
+from types import MappingProxyType
+
+import fitz  # PyMuPDF
+
+import branding
+import shared_assets
+
+try:
+    import tomllib  # Python 3.11+; older versions can use JSON profile files
+except ImportError:
+    tomllib = None
+
+# --- Configuration ---
+PROFILE_FILE = "brand_profiles.toml"
+METADATA_KEYS = ("title", "author", "subject", "keywords", "creator", "producer")
+
+# Settings a profile may set, with their types. Missing settings fall back to
+# the defaults in branding.default_profile().
+SETTINGS = {
+    "left_logo": str,
+    "right_logo": str,
+    "watermark_logo": str,
+    "watermark_opacity": float,
+    "watermark_size": float,
+    "logo_size": float,
+    "margin_top": float,
+    "margin_side": float,
+    "footer_text": str,
+    "footer_url": str,
+    "footer_offset": float,
+    "footer_size": float,
+    "footer_font": str,
+}
+FILE_SETTINGS = ("left_logo", "right_logo", "watermark_logo", "footer_font")
+
+# Profiles already compiled in this process, by (file, modification time, image_max_px)
+_PROFILE_CACHE = {}
+
+
+class ProfileError(ValueError):
+    pass
+
+
+def read_profile_file(path):
+    """
+    Reads a TOML (.toml) or JSON (any other extension) profile file.
+    """
+    with open(path, "rb") as f:
+        if path.lower().endswith(".toml"):
+            if tomllib is None:
+                raise ProfileError("TOML profile files need Python 3.11+, use a .json file instead")
+            return tomllib.load(f)
+        return json.load(f)
+
+
+def validate_settings(name, settings):
+    """
+    Checks one profile's settings and returns them with numbers as floats.
+    """
+    clean = {}
+    for key, value in settings.items():
+        if key not in SETTINGS:
+            raise ProfileError(f"Profile '{name}': unknown setting '{key}'")
+        kind = SETTINGS[key]
+        if kind is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, kind):
+            raise ProfileError(f"Profile '{name}': '{key}' must be a {'number' if kind is float else 'string'}")
+        if kind is float and value < 0:
+            raise ProfileError(f"Profile '{name}': '{key}' must not be negative")
+        clean[key] = value
+    if not 0 <= clean.get("watermark_opacity", 0) <= 1:
+        raise ProfileError(f"Profile '{name}': 'watermark_opacity' must be between 0 and 1")
+    return clean
+
+
+def compile_profile(name, settings, base_dir=".", image_max_px=None):
+    """
+    Validates one profile and prepares its images, returning an immutable
+    branding.BrandProfile. Logo and font paths are relative to the profile file.
+    """
+    if not isinstance(settings, dict):
+        raise ProfileError(f"Profile '{name}' must be a table of settings")
+    settings = validate_settings(name, settings)
+    for key in FILE_SETTINGS:
+        if key in settings:
+            settings[key] = os.path.join(base_dir, settings[key])
+            if not os.path.isfile(settings[key]):
+                raise ProfileError(f"Profile '{name}': {key} file not found: {settings[key]}")
+
+    profile = dataclasses.replace(branding.default_profile(), name=name, **settings)
+    assets = branding.prepare_assets(
+        profile.watermark_opacity,
+        image_max_px,
+        left_logo_path=profile.left_logo,
+        right_logo_path=profile.right_logo,
+        watermark_path=profile.watermark_logo,
+    )
+    return dataclasses.replace(profile, assets=MappingProxyType(assets))
+
+
+class ProfileSet:
+    """
+    Compiled profiles plus the rule table that picks one per input file.
+    Rules are tried in order; the first one whose patterns all match wins.
+    A rule can match the input path ("path") and any PDF metadata field
+    ("title", "author", ...), each with a case-insensitive glob pattern.
+    """
+
+    def __init__(self, profiles, rules, default):
+        self.profiles = MappingProxyType(profiles)
+        self.rules = tuple(rules)
+        self.default = default
+        self.needs_metadata = any(key in METADATA_KEYS for rule in self.rules for key in rule)
+
+    def __getitem__(self, name):
+        return self.profiles[name]
+
+    def select(self, input_path, metadata=None):
+        """
+        Returns the profile for an input file. The PDF metadata is only read
+        when a rule needs it and it was not passed in.
+        """
+        if metadata is None and self.needs_metadata:
+            try:
+                with fitz.open(input_path) as doc:
+                    metadata = doc.metadata or {}
+            except Exception:
+                metadata = {}
+        values = {"path": os.path.abspath(input_path), **(metadata or {})}
+        for rule in self.rules:
+            if all(
+                fnmatch.fnmatch((values.get(key) or "").lower(), pattern.lower())
+                for key, pattern in rule.items()
+                if key != "profile"
+            ):
+                return self.profiles[rule["profile"]]
+        return self.profiles[self.default]
+
+
+def compile_profiles(config, base_dir=".", image_max_px=None):
+    """
+    Validates a parsed profile file and compiles every profile in it.
+    """
+    profiles_config = config.get("profiles")
+    if not isinstance(profiles_config, dict) or not profiles_config:
+        raise ProfileError("The profile file needs at least one [profiles.<name>] table")
+    unknown = set(config) - {"default", "profiles", "rules"}
+    if unknown:
+        raise ProfileError(f"Unknown top-level key(s): {', '.join(sorted(unknown))}")
+
+    profiles = {
+        name: compile_profile(name, settings, base_dir, image_max_px)
+        for name, settings in profiles_config.items()
+    }
+
+    default = config.get("default", next(iter(profiles)))
+    if default not in profiles:
+        raise ProfileError(f"Default profile '{default}' is not defined")
+
+    rules = []
+    for number, rule in enumerate(config.get("rules", []), start=1):
+        if rule.get("profile") not in profiles:
+            raise ProfileError(f"Rule {number}: unknown profile '{rule.get('profile')}'")
+        patterns = set(rule) - {"profile"}
+        if not patterns:
+            raise ProfileError(f"Rule {number}: needs at least one pattern (path or a metadata field)")
+        for key in patterns:
+            if key != "path" and key not in METADATA_KEYS:
+                raise ProfileError(f"Rule {number}: cannot match on '{key}'")
+            if not isinstance(rule[key], str):
+                raise ProfileError(f"Rule {number}: '{key}' must be a string pattern")
+        rules.append(MappingProxyType(dict(rule)))
+    return ProfileSet(profiles, rules, default)
+
+
+def load_profiles(path=PROFILE_FILE, image_max_px=None):
+    """
+    Loads and compiles a profile file once per process; later calls with the
+    same unchanged file return the same compiled ProfileSet.
+    """
+    path = os.path.abspath(path)
+    key = (path, os.path.getmtime(path), image_max_px)
+    if key not in _PROFILE_CACHE:
+        try:
+            config = read_profile_file(path)
+        except ValueError as error:  # TOMLDecodeError and JSONDecodeError are ValueErrors
+            if isinstance(error, ProfileError):
+                raise
+            raise ProfileError(f"{path}: {error}") from error
+        _PROFILE_CACHE[key] = compile_profiles(config, os.path.dirname(path), image_max_px)
+    return _PROFILE_CACHE[key]
+
+
+def share_profiles(profile_set):
+    """
+    Publishes the images of every compiled profile in shared memory, so
+    worker processes use the parent's profiles instead of compiling the file
+    and loading the logos again. Returns (segments, shared): close every
+    SharedAssets in segments once the workers have stopped; shared is a
+    picklable {name: (profile without images, manifest)} for attach_profiles.
+    """
+    segments, shared = [], {}
+    for name, profile in profile_set.profiles.items():
+        assets = shared_assets.SharedAssets(profile.get_assets())
+        segments.append(assets)
+        shared[name] = (dataclasses.replace(profile, assets=None), assets.manifest)
+    return segments, shared
+
+
+def attach_profiles(shared):
+    """
+    In a worker: returns {name: BrandProfile} with the images read in place
+    from the parent's shared memory (see share_profiles).
+    """
+    return {
+        name: dataclasses.replace(profile, assets=MappingProxyType(shared_assets.attach_assets(manifest)))
+        for name, (profile, manifest) in shared.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a brand profile file and show which profile each PDF gets.")
+    parser.add_argument("profiles", nargs="?", default=PROFILE_FILE, help=f"profile file (default: {PROFILE_FILE})")
+    parser.add_argument("inputs", nargs="*", help="PDF files to match against the rules")
+    args = parser.parse_args()
+
+    try:
+        profile_set = load_profiles(args.profiles)
+    except (OSError, ProfileError) as error:
+        print(f"Invalid profiles: {error}")
+        sys.exit(1)
+    for name, profile in profile_set.profiles.items():
+        marker = " (default)" if name == profile_set.default else ""
+        print(f"{name}{marker}: {profile.footer_text} | {profile.footer_url}")
+    for input_path in args.inputs:
+        print(f"{input_path} -> {profile_set.select(input_path).name}")
@@ -0,0 +1,115 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import tracemalloc
+
+# --- Configuration ---
+PROFILE_DIR = "profiles_output"
+TOP_FUNCTIONS = 30     # Lines in the text summary
+TOP_ALLOCATIONS = 25   # Lines in the memory report
+TRACE_FRAMES = 10      # Stack depth tracemalloc keeps per allocation
+MAX_STACK_DEPTH = 40   # Collapsed stacks deeper than this are cut
+MIN_SHARE = 1e-4       # Seconds; smaller slices of a stack follow only their heaviest caller
+
+
+def function_name(func):
+    filename, line, name = func
+    if filename == "~":
+        return name  # Built-ins, e.g. <method 'insert_image' ...>
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+def collapsed_stacks(stats):
+    """
+    Turns cProfile data into "caller;callee;... microseconds" lines for
+    flamegraph.pl, speedscope or inferno. cProfile only records caller ->
+    callee edges, not whole stacks, so each function's own time is split
+    over its callers in proportion to the time spent through each caller.
+    Good enough to see where the time goes, not an exact sampled profile.
+    """
+    entries = stats.stats  # func -> (cc, nc, tottime, cumtime, callers)
+    totals = {}
+
+    def emit(stack, share):
+        key = ";".join(function_name(f) for f in reversed(stack))
+        totals[key] = totals.get(key, 0) + share
+
+    def walk(func, stack, share, seen):
+        callers = {caller: edge for caller, edge in entries[func][4].items() if caller in entries and caller not in seen}
+        if not callers or len(stack) >= MAX_STACK_DEPTH:
+            emit(stack, share)
+            return
+        weights = {caller: edge[3] for caller, edge in callers.items()}
+        if share < MIN_SHARE:
+            # Too small to split: follow the heaviest caller, so the stack still reaches its root
+            caller = max(weights, key=weights.get)
+            walk(caller, stack + [caller], share, seen | {caller})
+            return
+        weight_sum = sum(weights.values())
+        for caller, weight in weights.items():
+            part = share * (weight / weight_sum if weight_sum else 1 / len(weights))
+            walk(caller, stack + [caller], part, seen | {caller})
+
+    for func, (cc, nc, tottime, cumtime, callers) in entries.items():
+        if tottime > 0:
+            walk(func, [func], tottime, {func})
+    return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in sorted(totals.items()) if seconds >= 1e-6]
+
+
+def memory_report(snapshot, peak_bytes):
+    lines = [f"Peak traced memory: {peak_bytes / 1e6:.1f} MB", "", f"Top {TOP_ALLOCATIONS} allocation sites (still allocated at the end):"]
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    for number, stat in enumerate(snapshot.statistics("lineno")[:TOP_ALLOCATIONS], start=1):
+        frame = stat.traceback[0]
+        lines.append(f"{number:>3}. {stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+def profile_call(label, func, *args, profile_dir=PROFILE_DIR, trace_memory=False, **kwargs):
+    """
+    Runs func(*args, **kwargs) under cProfile (and tracemalloc if
+    trace_memory) and writes to profile_dir:
+      <label>.pstats        load with pstats or snakeviz
+      <label>.txt           top functions by cumulative time
+      <label>.collapsed     flamegraph input (flamegraph.pl, speedscope)
+      <label>.memory.txt    top allocation sites and peak (trace_memory only)
+    Memory tracing slows the run down a lot, so the timings in a run with
+    trace_memory are not representative. Returns func's result.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    base = os.path.join(profile_dir, label)
+
+    if trace_memory:
+        tracemalloc.start(TRACE_FRAMES)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    profiler.dump_stats(base + ".pstats")
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(f"Wall time: {elapsed:.3f}s\n")
+        f.write(summary.getvalue())
+    with open(base + ".collapsed", "w", encoding="utf-8") as f:
+        f.write("\n".join(collapsed_stacks(stats)) + "\n")
+    if trace_memory:
+        with open(base + ".memory.txt", "w", encoding="utf-8") as f:
+            f.write(memory_report(snapshot, peak))
+    print(f"Profile: {base}.* ({elapsed:.2f}s)")
+    return result
@@ -0,0 +1,115 @@
+import fitz  # PyMuPDF
+from functools import lru_cache
+from urllib.parse import urlencode
+
+try:
+    import segno  # Optional: pip install segno
+except ImportError:
+    segno = None
+
+# --- Configuration ---
+QR_SIZE = 42          # Printed size of the QR code, in points
+QR_BORDER = 2         # Quiet zone around the code, in modules
+QR_ERROR = "m"        # Error correction level (l, m, q, h)
+QR_MASK = 0           # Fixed mask pattern: skips scoring all 8 masks, about 5x faster to encode
+
+
+def qr_payload(base_url, doc_id, page_num=None):
+    """
+    Link printed in the QR code, e.g. https://dbggurukulam.com/?d=maths-class-1&p=3
+    """
+    params = {"d": doc_id}
+    if page_num is not None:
+        params["p"] = page_num
+    return f"{base_url.rstrip('/')}/?{urlencode(params)}"
+
+
+@lru_cache(maxsize=4096)
+def qr_drawing(payload):
+    """
+    Returns (size_in_modules, content stream) drawing the QR code as vector
+    rectangles in module units. Dark modules in the same row are merged into
+    one rectangle, which keeps the stream short. Cached by payload.
+    """
+    if segno is None:
+        raise RuntimeError("QR stamps need the segno package: pip install segno")
+
+    matrix = segno.make(payload, error=QR_ERROR, mask=QR_MASK, micro=False).matrix
+    size = len(matrix) + 2 * QR_BORDER
+    ops = [f"1 g 0 0 {size} {size} re f 0 g"]  # White background keeps it scannable over the watermark
+    for row_num, row in enumerate(matrix):
+        # PDF y grows upwards, the matrix rows go downwards
+        y = size - QR_BORDER - row_num - 1
+        col = 0
+        while col < len(row):
+            if row[col]:
+                start = col
+                while col < len(row) and row[col]:
+                    col += 1
+                ops.append(f"{start + QR_BORDER} {y} {col - start} 1 re")
+            else:
+                col += 1
+    ops.append("f")
+    return size, "\n".join(ops).encode("ascii")
+
+
+class QRStamper:
+    """
+    Adds QR codes to the pages of one document. Every distinct payload is
+    embedded once as a Form XObject; pages with the same payload (e.g. the
+    document link on every page) all reference that one object.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.xobjects = {}
+
+    def xobject(self, payload):
+        if payload not in self.xobjects:
+            size, stream = qr_drawing(payload)
+            xref = self.doc.get_new_xref()
+            self.doc.update_object(xref, f"<</Type/XObject/Subtype/Form/BBox[0 0 {size} {size}]/Resources<<>>>>")
+            self.doc.update_stream(xref, stream)
+            self.xobjects[payload] = xref
+        return self.xobjects[payload]
+
+    def xobject_dict(self, page):
+        """
+        Returns (xref, key path prefix) of the page's /XObject resource dict.
+        /Resources and /XObject may be indirect objects (PyMuPDF and many
+        other producers write them so), and xref_set_key cannot set a key
+        through an indirect reference, so the path starts at the last one.
+        """
+        owner, path = page.xref, "Resources/"
+        kind, value = self.doc.xref_get_key(owner, "Resources")
+        if kind == "xref":
+            owner, path = int(value.split()[0]), ""
+        kind, value = self.doc.xref_get_key(owner, f"{path}XObject")
+        if kind == "xref":
+            return int(value.split()[0]), ""
+        return owner, f"{path}XObject/"
+
+    def stamp(self, page, rect, payload):
+        """
+        Draws the QR code for payload into rect (page coordinates).
+        The page content must already be wrapped in q/Q, which PyMuPDF does
+        when the footer is inserted.
+        """
+        xref = self.xobject(payload)
+        name = f"DBGQR{xref}"
+        owner, path = self.xobject_dict(page)
+        self.doc.xref_set_key(owner, f"{path}{name}", f"{xref} 0 R")
+
+        # Page coordinates (top-left origin) to PDF user space
+        box = fitz.Rect(rect) * ~page.transformation_matrix
+        box.normalize()
+        size, _ = qr_drawing(payload)
+        scale = box.width / size
+        stream = f"q {scale:.4f} 0 0 {scale:.4f} {box.x0:.2f} {box.y0:.2f} cm /{name} Do Q"
+
+        content = self.doc.get_new_xref()
+        self.doc.update_object(content, "<<>>")
+        self.doc.update_stream(content, stream.encode("ascii"))
+        kind, value = self.doc.xref_get_key(page.xref, "Contents")
+        existing = value.strip("[]") if kind == "array" else value
+        self.doc.xref_set_key(page.xref, "Contents", f"[{existing} {content} 0 R]")
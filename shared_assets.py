@@ -0,0 +1,67 @@
+from multiprocessing import shared_memory
+
+
+class SharedAssets:
+    """
+    Publishes the prepared branding assets in shared memory segments.
+    The parent creates one segment per asset; workers attach to them by name
+    and read the bytes in place, so every worker uses the same physical pages.
+    """
+
+    def __init__(self, assets):
+        self.segments = []
+        self.manifest = {}
+        for name, data in assets.items():
+            if data is None:
+                self.manifest[name] = None
+                continue
+            segment = shared_memory.SharedMemory(create=True, size=len(data))
+            segment.buf[:len(data)] = data
+            self.segments.append(segment)
+            self.manifest[name] = (segment.name, len(data))
+
+    def close(self):
+        """
+        Frees the segments. Call once all workers have stopped.
+        """
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Segments attached by this process; kept open for the life of the worker
+_ATTACHED = []
+
+
+def _attach_segment(segment_name):
+    try:
+        return shared_memory.SharedMemory(name=segment_name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older versions register the segment again; workers started by
+        # multiprocessing share the parent's resource tracker, so this is
+        # harmless and the parent still owns (and unlinks) the segment.
+        return shared_memory.SharedMemory(name=segment_name)
+
+
+def attach_assets(manifest):
+    """
+    Returns the assets as read-only memoryviews into the parent's segments.
+    No bytes are copied, so this takes well under a millisecond per asset.
+    """
+    assets = {}
+    for name, entry in manifest.items():
+        if entry is None:
+            assets[name] = None
+            continue
+        segment_name, size = entry
+        segment = _attach_segment(segment_name)
+        _ATTACHED.append(segment)
+        assets[name] = segment.buf[:size].toreadonly()
+    return assets
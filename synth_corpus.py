@@ -0,0 +1,254 @@
+import io
+import os
+import sys
+import time
+import random
+import argparse
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import branding
+import batch_branding
+
+# --- Configuration ---
+OUTPUT_DIR = "synthetic_corpus"
+FIXED_DATE = "D:20240101000000Z"  # Same dates in every file, so a seed always gives the same bytes
+SUPERLINEAR_RATIO = 2.0           # Flag steps whose marginal cost per page is this many times the first step's
+WORDS = (
+    "addition subtraction number place value tens ones hundreds count write fill blank "
+    "compare greater smaller equal shape circle square triangle time clock money rupee "
+    "measure length weight table multiply divide share group pattern answer question marks"
+).split()
+
+
+def parse_range(text):
+    """
+    "5" -> (5, 5), "1-50" -> (1, 50).
+    """
+    low, _, high = text.partition("-")
+    low = int(low)
+    high = int(high) if high else low
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError(f"Not a valid range: {text}")
+    return low, high
+
+
+def page_range(text):
+    """
+    parse_range for page counts: a PDF needs at least one page.
+    """
+    low, high = parse_range(text)
+    if low < 1:
+        raise argparse.ArgumentTypeError(f"A PDF needs at least 1 page: {text}")
+    return low, high
+
+
+def noise_image(rng, target_bytes):
+    """
+    A JPEG of random pixels of about target_bytes (noise barely compresses,
+    like a scanned photo). Returns None for 0.
+    """
+    if target_bytes <= 0:
+        return None
+    side = max(8, int((target_bytes / 0.65) ** 0.5))  # Noise JPEG at quality 75: about 0.65 bytes per pixel
+    image = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=75)
+    return out.getvalue()
+
+
+def add_page(doc, rng, size, rotation, image_kb, text_lines):
+    width, height = fitz.paper_size(size)
+    page = doc.new_page(width=width, height=height)
+
+    if text_lines:
+        lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 10))) for _ in range(text_lines)]
+        fontsize = min(11, (height - 160) / text_lines / 1.4)
+        page.insert_text((50, 80), "\n".join(lines), fontsize=fontsize, fontname="helv")
+
+    image = noise_image(rng, image_kb * 1024)
+    if image:
+        # Somewhere on the page, like a figure between the questions
+        box_w = rng.uniform(0.25, 0.6) * width
+        x0 = rng.uniform(40, width - 40 - box_w)
+        y0 = rng.uniform(100, height - 100 - box_w)
+        page.insert_image(fitz.Rect(x0, y0, x0 + box_w, y0 + box_w), stream=image)
+
+    if rotation:
+        page.set_rotation(rotation)
+
+
+def make_pdf(path, seed, pages, sizes=("a4",), rotations=(0,), image_kb=(0, 0), text_lines=(20, 20)):
+    """
+    Writes one synthetic PDF. Every random choice comes from seed, so the same
+    arguments always produce the same bytes.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        add_page(
+            doc, rng,
+            size=rng.choice(sizes),
+            rotation=rng.choice(rotations),
+            image_kb=rng.randint(*image_kb),
+            text_lines=rng.randint(*text_lines),
+        )
+    doc.set_metadata({
+        "title": os.path.splitext(os.path.basename(path))[0],
+        "producer": "synth_corpus.py",
+        "creationDate": FIXED_DATE,
+        "modDate": FIXED_DATE,
+    })
+    file_id = f"{seed % (1 << 128):032X}"
+    doc.xref_set_key(-1, "ID", f"[<{file_id}><{file_id}>]")
+    doc.save(path, garbage=1, no_new_id=True)
+    doc.close()
+    return path
+
+
+def make_corpus(output_dir, files, pages, seed=1, **options):
+    """
+    Writes files synthetic PDFs with page counts drawn from the pages range.
+    Returns the list of paths.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    width = len(str(files))
+    written = []
+    for number in range(1, files + 1):
+        page_count = rng.randint(*pages)
+        path = os.path.join(output_dir, f"synthetic_{number:0{width}d}_{page_count}p.pdf")
+        written.append(make_pdf(path, rng.getrandbits(64), page_count, **options))
+        print(f"Wrote: {path}")
+    return written
+
+
+def time_branding(path, repeats=1):
+    """
+    Best-of-repeats seconds to brand a file in memory (nothing written).
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        doc, release_input = branding.open_pdf(path)
+        branding.brand_document(doc)
+        doc.tobytes()
+        doc.close()
+        release_input()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def scaling_run(page_counts, work_dir, seed=1, repeats=1, **options):
+    """
+    Brands synthetic files of growing page counts. Every file pays a fixed
+    cost (logos, watermark, saving) plus a cost per page, so the time per page
+    of a small file is mostly fixed cost. The marginal cost between successive
+    page counts, (t_i - t_{i-1}) / (n_i - n_{i-1}), leaves the fixed cost out
+    and should stay flat; a step whose marginal cost is SUPERLINEAR_RATIO
+    times the first step's is flagged. Also prints the least-squares fit
+    seconds = a + b * pages. Returns True if no step was flagged.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    branding.load_assets()  # Keep asset preparation out of the timings
+    print(f"{'Pages':>7}{'MB':>8}{'Seconds':>10}{'Marginal ms/page':>18}")
+    runs = []
+    base = None
+    linear = True
+    for pages in page_counts:
+        path = make_pdf(os.path.join(work_dir, f"scaling_{pages}p.pdf"), seed, pages, **options)
+        seconds = time_branding(path, repeats)
+        marginal, flag = "-", ""
+        if runs:
+            previous_pages, previous_seconds = runs[-1]
+            per_page = (seconds - previous_seconds) / (pages - previous_pages) * 1000
+            marginal = f"{per_page:.2f}"
+            if base is None and per_page > 0:  # Timing noise can make a small first step negative
+                base = per_page
+            elif base and per_page > base * SUPERLINEAR_RATIO:
+                flag = f"  <- {per_page / base:.1f}x the marginal cost of the first step"
+                linear = False
+        runs.append((pages, seconds))
+        print(f"{pages:>7}{os.path.getsize(path) / 1e6:>8.1f}{seconds:>10.3f}{marginal:>18}{flag}")
+
+    if len(runs) > 1:
+        mean_pages = sum(pages for pages, _ in runs) / len(runs)
+        mean_seconds = sum(seconds for _, seconds in runs) / len(runs)
+        slope = (sum((pages - mean_pages) * (seconds - mean_seconds) for pages, seconds in runs)
+                 / sum((pages - mean_pages) ** 2 for pages, _ in runs))
+        print(f"Fit: {(mean_seconds - slope * mean_pages) * 1000:.1f} ms per file + {slope * 1000:.2f} ms per page")
+    return linear
+
+
+def worker_scaling_run(worker_counts, work_dir, files, pages, seed=1, **options):
+    """
+    Brands the same synthetic corpus with batch_branding on each number of
+    worker processes and reports the wall time, the speed-up over the first
+    count and the efficiency (speed-up divided by the growth in workers;
+    100% is perfect scaling). Workers beyond the CPU count cannot add speed.
+    Returns {workers: seconds}.
+    """
+    corpus = make_corpus(os.path.join(work_dir, "workers_corpus"), files, pages, seed, **options)
+    timings = {}
+    for workers in worker_counts:
+        output_dir = os.path.join(work_dir, f"workers_{workers}")
+        os.makedirs(output_dir, exist_ok=True)
+        jobs, _ = batch_branding.build_jobs(corpus, output_dir)
+        start = time.perf_counter()
+        batch_branding.run_batch(jobs, workers)
+        timings[workers] = time.perf_counter() - start
+
+    first = worker_counts[0]
+    print("=" * 30)
+    print(f"{len(corpus)} file(s), {os.cpu_count()} CPU(s)")
+    print(f"{'Workers':>7}{'Seconds':>10}{'Speed-up':>10}{'Efficiency':>12}")
+    for workers, seconds in timings.items():
+        speedup = timings[first] / seconds
+        print(f"{workers:>7}{seconds:>10.2f}{speedup:>9.2f}x{speedup * first / workers:>11.0%}")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate reproducible synthetic PDFs for load and scaling tests.")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help=f"output folder (default: {OUTPUT_DIR})")
+    parser.add_argument("--files", type=int, default=10, help="number of PDFs to write")
+    parser.add_argument("--pages", type=page_range, default=(1, 20), help="pages per file, e.g. 3 or 1-5000")
+    parser.add_argument("--sizes", default="a4", help="page sizes to pick from, e.g. a4,letter,a3")
+    parser.add_argument("--rotations", default="0", help="page rotations to pick from, e.g. 0,90,180,270")
+    parser.add_argument("--image-kb", type=parse_range, default=(0, 0), help="embedded image weight per page in KB, e.g. 0-300")
+    parser.add_argument("--text-lines", type=parse_range, default=(20, 20), help="lines of text per page, e.g. 5-60")
+    parser.add_argument("--seed", type=int, default=1, help="same seed and options give byte-identical files")
+    parser.add_argument("--scaling", default=None, metavar="N,N,...",
+                        help="instead of a corpus, time branding at these page counts, e.g. 10,100,500,1000")
+    parser.add_argument("--repeats", type=int, default=1, help="with --scaling, runs per page count (best is kept)")
+    parser.add_argument("--workers", default=None, metavar="N,N,...",
+                        help="instead of a corpus, time batch branding of a --files corpus on these worker counts, e.g. 1,2,4")
+    args = parser.parse_args()
+
+    options = {
+        "sizes": tuple(size.strip() for size in args.sizes.split(",")),
+        "rotations": tuple(int(rotation) for rotation in args.rotations.split(",")),
+        "image_kb": args.image_kb,
+        "text_lines": args.text_lines,
+    }
+    for size in options["sizes"]:
+        if fitz.paper_size(size) == (-1, -1):
+            parser.error(f"unknown page size: {size}")
+    if any(rotation % 90 for rotation in options["rotations"]):
+        parser.error("rotations must be multiples of 90")
+
+    if args.scaling:
+        page_counts = sorted({int(count) for count in args.scaling.split(",")})
+        if page_counts[0] < 1:
+            parser.error("--scaling page counts must be at least 1")
+        sys.exit(0 if scaling_run(page_counts, args.output_dir, args.seed, args.repeats, **options) else 1)
+    if args.workers:
+        worker_counts = sorted({max(1, int(count)) for count in args.workers.split(",")})
+        worker_scaling_run(worker_counts, args.output_dir, args.files, args.pages, args.seed, **options)
+        sys.exit(0)
+
+    written = make_corpus(args.output_dir, args.files, args.pages, args.seed, **options)
+    print("=" * 30)
+    print(f"Wrote {len(written)} synthetic PDF(s) to {args.output_dir}.")
@@ -0,0 +1,92 @@
+import sys
+import sqlite3
+import argparse
+
+# --- Configuration ---
+INDEX_FILE = "search_index.db"
+BATCH_PAGES = 1000   # Pages buffered before one transaction is committed
+PAGE_BITS = 20       # rowid = file id << PAGE_BITS | page number (up to ~1M pages per file)
+
+
+class TextIndex:
+    """
+    SQLite FTS5 full-text index of branded pages, keyed by output file and
+    page number. Pages are buffered and written in large transactions, which
+    is far faster than committing page by page.
+    """
+
+    def __init__(self, path=INDEX_FILE, batch_pages=BATCH_PAGES):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, output TEXT UNIQUE NOT NULL)")
+        self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(output UNINDEXED, page UNINDEXED, text)")
+        self.batch_pages = batch_pages
+        self.pending = []
+
+    def file_id(self, output):
+        row = self.db.execute("SELECT id FROM files WHERE output = ?", (output,)).fetchone()
+        if row:
+            return row[0]
+        return self.db.execute("INSERT INTO files (output) VALUES (?)", (output,)).lastrowid
+
+    def add_document(self, output, page_texts):
+        """
+        Queues the text of every page of one output file (page 1 first).
+        Re-indexing the same output replaces its old pages.
+        """
+        file_id = self.file_id(output)
+        first = file_id << PAGE_BITS
+        # Pages still queued for this output would clash with the new rowids
+        self.pending = [row for row in self.pending if row[1] != output]
+        # Deleting by rowid range is cheap in FTS5; deleting by column is a full scan
+        self.db.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?", (first, first + (1 << PAGE_BITS) - 1))
+        self.pending.extend(
+            (first + page_num, output, page_num, text)
+            for page_num, text in enumerate(page_texts, start=1)
+        )
+        if len(self.pending) >= self.batch_pages:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.db.executemany("INSERT INTO pages (rowid, output, page, text) VALUES (?, ?, ?, ?)", self.pending)
+            self.pending = []
+        self.db.commit()
+
+    def search(self, query, limit=20):
+        """
+        Returns (output, page, snippet) tuples, best matches first.
+        """
+        self.flush()
+        return self.db.execute(
+            "SELECT output, page, snippet(pages, 2, '[', ']', '...', 12) FROM pages "
+            "WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+            (query, limit),
+        ).fetchall()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the text index built during branding.")
+    parser.add_argument("query", help='FTS5 query, e.g. "addition" or "place NEAR value"')
+    parser.add_argument("--index", default=INDEX_FILE, help=f"index file (default: {INDEX_FILE})")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with TextIndex(args.index) as index:
+        results = index.search(args.query, args.limit)
+    for output, page, snippet in results:
+        print(f"{output} (page {page}): {' '.join(snippet.split())}")
+    if not results:
+        print("No matches.")
+        sys.exit(1)
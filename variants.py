@@ -0,0 +1,134 @@
+import os
+import time
+import argparse
+import multiprocessing
+
+import branding
+import qr_stamp
+
+# --- Configuration ---
+OUTPUT_DIR = "variants_output"
+
+# Named branding configurations: brand_document options, plus image_max_px
+# for the size of the watermark and logos. A variant's QR code is left out
+# (with a note) when segno is not installed.
+VARIANTS = {
+    "all-pages": {},
+    "first-page": {"logos_all_pages": False},
+    # Full-resolution logos, images never downsampled, content never covered, QR link to the online copy
+    "print": {"image_max_px": None, "optimise_images": None, "avoid_collisions": True, "qr": "document"},
+    "screen": {"image_max_px": 600, "optimise_images": 150}, # Light version for phones
+}
+
+
+def variant_path(input_path, output_dir, name):
+    """
+    Output file for one variant, e.g. DBG_Maths_Class_1_screen.pdf.
+    """
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, f"DBG_{stem}_{name}.pdf")
+
+
+def write_variant(doc, input_path, output_path, options, assets, deterministic=False):
+    """
+    Brands doc with one variant's options and saves it. doc is changed, so
+    it must be a private copy (a forked child's, or a freshly opened one).
+    """
+    branding.install_assets(assets)
+    branding.brand_document(doc, **options)
+    if deterministic:
+        branding.make_reproducible(doc, input_path, options)
+    doc.save(output_path, no_new_id=deterministic)
+
+
+def brand_variants(input_path, names, output_dir, workers=None, deterministic=False):
+    """
+    Writes one branded file per named variant from a single open of the input.
+    The input is parsed once; each distinct logo size is prepared once and
+    shared by every variant that uses it.
+
+    Where fork() is available every variant runs in its own child process,
+    which starts from a copy-on-write copy of the parsed document, so several
+    outputs are written at the same time (PyMuPDF itself is not thread-safe).
+    Elsewhere the variants run one after another from the same memory mapping.
+    Returns {name: output path} for the variants that were written.
+    """
+    input_path = os.path.abspath(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    asset_sets = {}
+    jobs = []
+    for name in names:
+        options = dict(VARIANTS[name])
+        image_max_px = options.pop("image_max_px", None)
+        if options.get("qr") and qr_stamp.segno is None:
+            print(f"  {name}: no QR code (pip install segno to add it)")
+            options.pop("qr")
+        if options.get("qr"):
+            options.setdefault("doc_id", branding.document_id(input_path))
+        if image_max_px not in asset_sets:
+            asset_sets[image_max_px] = branding.prepare_assets(image_max_px=image_max_px)
+        jobs.append((name, variant_path(input_path, output_dir, name), options, asset_sets[image_max_px]))
+
+    written = {}
+    doc, release_input = branding.open_pdf(input_path)
+    try:
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Load the page objects once here; MuPDF caches them, so the children inherit them parsed
+            for page in doc:
+                page.get_contents()
+            running = []
+            for index, (name, output_path, options, assets) in enumerate(jobs):
+                child = multiprocessing.get_context("fork").Process(
+                    target=write_variant,
+                    args=(doc, input_path, output_path, options, assets, deterministic),
+                )
+                child.start()
+                running.append((name, output_path, child))
+                while running and (len(running) >= workers or index == len(jobs) - 1):
+                    name_done, path_done, done = running.pop(0)
+                    done.join()
+                    if done.exitcode == 0:
+                        written[name_done] = path_done
+                        print(f"Saved: {path_done}")
+                    else:
+                        print(f"Failed: {name_done} variant (exit code {done.exitcode})")
+        else:
+            doc.close()
+            release_input()
+            for name, output_path, options, assets in jobs:
+                doc, release_input = branding.open_pdf(input_path)
+                write_variant(doc, input_path, output_path, options, assets, deterministic)
+                doc.close()
+                release_input()
+                written[name] = output_path
+                print(f"Saved: {output_path}")
+            doc = None
+    finally:
+        if doc is not None:
+            doc.close()
+            release_input()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write several branded versions of a PDF from one parse.")
+    parser.add_argument("inputs", nargs="+", help="PDF files")
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=sorted(VARIANTS),
+                        help="variants to write (default: all)")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help=f"output folder (default: {OUTPUT_DIR})")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="variants written at the same time")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="byte-identical output for identical inputs (fixed document ID and dates)")
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    total = 0
+    for input_path in args.inputs:
+        print(f"Processing: {input_path}...")
+        total += len(brand_variants(input_path, args.variants, args.output_dir, args.workers, args.deterministic))
+        print("-" * 30)
+    print("=" * 30)
+    print(f"Wrote {total} file(s) to {args.output_dir} in {time.monotonic() - start:.1f}s.")
@@ -0,0 +1,160 @@
+import fitz  # PyMuPDF
+import os
+import sys
+import tempfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np  # Requires: pip install numpy
+
+import branding
+
+# --- Configuration ---
+GOLDEN_DIR = "golden_renders"
+# Listed by name: a glob would also pick up DBG_*.pdf outputs and other stray PDFs
+SAMPLE_PDFS = [
+    "Class_1_Exam_Paper_Fixed.pdf",
+    "Class_1_Maths_Perfect.pdf",
+    "Maths Bodh Manthan II Class 1.pdf",
+    "Maths Bodh Manthan II Class 4 v1.0.pdf",
+    "Maths Bodh Manthan II Class LKG  v1.0.pdf",
+    "Maths Bodh Manthan II Class UKG v2.0.pdf",
+]
+RENDER_DPI = 36            # Low DPI is enough to see a logo or footer move
+PIXEL_THRESHOLD = 24       # Per-channel difference (0-255) that counts as "changed"
+MAX_CHANGED_RATIO = 0.001  # A page fails if more than 0.1% of its pixels changed
+
+
+def default_inputs():
+    """
+    The sample PDFs bundled in the repository root (SAMPLE_PDFS).
+    """
+    return list(SAMPLE_PDFS)
+
+
+def golden_path(pdf_name, page_num):
+    stem = os.path.splitext(os.path.basename(pdf_name))[0]
+    return os.path.join(GOLDEN_DIR, stem, f"page-{page_num + 1:03d}.png")
+
+
+def pixmap_to_array(pix):
+    """
+    Returns the pixmap samples as a (height, width, channels) uint8 array.
+    pix.samples is a copy, so the array stays valid after the pixmap is freed.
+    """
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def render_page(pdf_path, page_num, dpi=RENDER_DPI):
+    with fitz.open(pdf_path) as doc:
+        return doc[page_num].get_pixmap(dpi=dpi, alpha=False)
+
+
+def changed_regions(mask, dpi=RENDER_DPI):
+    """
+    Groups the changed pixels into horizontal bands (e.g. header, footer)
+    and returns one bounding box per band, in PDF points.
+    """
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return []
+
+    scale = 72.0 / dpi
+    regions = []
+    # Split the changed rows wherever there is a gap of unchanged rows
+    for band in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+        cols = np.flatnonzero(mask[band[0]:band[-1] + 1].any(axis=0))
+        regions.append(tuple(round(float(value) * scale, 1) for value in (cols[0], band[0], cols[-1] + 1, band[-1] + 1)))
+    return regions
+
+
+def compare_page(task):
+    """
+    Renders one branded page and diffs it against its golden image.
+    Runs inside a worker process.
+    """
+    branded_path, pdf_name, page_num = task
+    result = {"file": pdf_name, "page": page_num + 1, "score": 0.0, "changed": 0.0, "regions": []}
+
+    reference = golden_path(pdf_name, page_num)
+    if not os.path.exists(reference):
+        result["error"] = "missing golden render"
+        return result
+
+    current = pixmap_to_array(render_page(branded_path, page_num))
+    golden = pixmap_to_array(fitz.Pixmap(reference))
+    if current.shape != golden.shape:
+        result["error"] = f"size changed {golden.shape[1]}x{golden.shape[0]} -> {current.shape[1]}x{current.shape[0]}"
+        return result
+
+    diff = np.abs(current.astype(np.int16) - golden.astype(np.int16))
+    mask = diff.max(axis=2) > PIXEL_THRESHOLD
+
+    result["score"] = float(diff.mean() / 255.0)
+    result["changed"] = float(mask.mean())
+    result["regions"] = changed_regions(mask)
+    return result
+
+
+def save_golden_page(task):
+    branded_path, pdf_name, page_num = task
+    target = golden_path(pdf_name, page_num)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    render_page(branded_path, page_num).save(target)
+    return target
+
+
+def brand_sample(task):
+    pdf_name, work_dir = task
+    output_path = os.path.join(work_dir, os.path.basename(pdf_name))
+    branding.apply_branding(pdf_name, output_path)
+    with fitz.open(output_path) as doc:
+        return pdf_name, output_path, doc.page_count
+
+
+def run(inputs, update=False, workers=None):
+    failures = 0
+    with tempfile.TemporaryDirectory() as work_dir, ProcessPoolExecutor(max_workers=workers) as pool:
+        branded = list(pool.map(brand_sample, [(name, work_dir) for name in inputs]))
+
+        tasks = []
+        for pdf_name, output_path, page_count in branded:
+            tasks.extend((output_path, pdf_name, page_num) for page_num in range(page_count))
+
+            # A page that disappeared from the output is a regression too
+            stale = golden_path(pdf_name, page_count)
+            if not update and os.path.exists(stale):
+                print(f"FAIL  {pdf_name}: fewer pages than the golden render")
+                failures += 1
+
+        if update:
+            for target in pool.map(save_golden_page, tasks):
+                print(f"Updated: {target}")
+            return 0
+
+        print(f"{'Result':<6}{'Page':>5}  {'Score':>8}  {'Changed':>8}  File / regions (pt)")
+        for result in pool.map(compare_page, tasks):
+            failed = "error" in result or result["changed"] > MAX_CHANGED_RATIO
+            failures += failed
+            print(
+                f"{'FAIL' if failed else 'ok':<6}{result['page']:>5}  {result['score']:>8.5f}  "
+                f"{result['changed']:>8.4%}  {result['file']}"
+            )
+            if "error" in result:
+                print(f"{'':<6}{result['error']}")
+            for region in result["regions"]:
+                print(f"{'':<6}changed region: {region}")
+
+    print("-" * 30)
+    print(f"{failures} page(s) differ from the golden renders." if failures else "All pages match the golden renders.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare branded output against the stored golden renders.")
+    parser.add_argument("inputs", nargs="*", help="PDFs to brand and check (default: sample PDFs in this folder)")
+    parser.add_argument("--update", action="store_true", help="re-create the golden renders from the current branding")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    sys.exit(run(args.inputs or default_inputs(), update=args.update, workers=args.workers))